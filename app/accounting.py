@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+
+# resources used by the processes we run (and the processes they start), sampled from /proc
+
+try:
+    pageSize = os.sysconf('SC_PAGE_SIZE')
+    clockTicks = os.sysconf('SC_CLK_TCK')
+except (ValueError, OSError, AttributeError):
+    pageSize = 4096
+    clockTicks = 100
+
+# returns [ppid, cpu time (seconds), rss (bytes)] for the given pid
+
+
+def readProcStat(pid):
+    with open('/proc/' + str(pid) + '/stat', 'r') as f:
+        data = f.read()
+    # the process name is between parentheses and can contain spaces, so we start after it (the state is field 3)
+    fields = data[data.rfind(')') + 2:].split()
+    return [int(fields[1]), (int(fields[11]) + int(fields[12])) / clockTicks, int(fields[21]) * pageSize]
+
+# returns pid -> [ppid, cpu time, rss] for every process in the system (empty if /proc is not available)
+
+
+def readAllProcStats():
+    stats = dict()
+    try:
+        pids = [p for p in os.listdir('/proc') if p.isdigit()]
+    except OSError:
+        return stats
+    for pid in pids:
+        try:
+            stats[int(pid)] = readProcStat(pid)
+        except (IOError, OSError, ValueError, IndexError):
+            pass                                    # the process is gone
+    return stats
+
+# returns the pid and the pids of all its descendants
+
+
+def getProcessTree(pid, stats):
+    children = dict()
+    for p in stats:
+        children.setdefault(stats[p][0], []).append(p)
+    tree = []
+    pending = [int(pid)]
+    while pending:
+        p = pending.pop()
+        if p in stats:
+            tree.append(p)
+            pending.extend(children.get(p, []))
+    return tree
+
+# this class accumulates the resources used by a process and its descendants. the cpu time of each process is the last
+# value we saw before it exited, so processes that live less than the sampling interval are not accounted for.
+# if the process was never seen (it exited before the first sample) there are no figures at all rather than zeros.
+
+
+class ProcessUsage():
+    def __init__(self, pid):
+        self.pid = int(pid)
+        self.peakRss = 0
+        self.cpu = dict()
+        self.samples = 0
+
+    def sample(self, stats=None):
+        if stats is None:
+            stats = readAllProcStats()
+        tree = getProcessTree(self.pid, stats)
+        if not tree:
+            return
+        self.samples += 1
+        rss = 0
+        for p in tree:
+            rss += stats[p][2]
+            self.cpu[p] = max(self.cpu.get(p, 0), stats[p][1])
+        self.peakRss = max(self.peakRss, rss)
+
+    def getPeakRss(self):
+        if not self.samples:
+            return None
+        return self.peakRss
+
+    def getCpuTime(self):
+        if not self.samples:
+            return None
+        return sum(self.cpu.values())
+
+
+def formatSize(size):
+    if size is None or size == '':
+        return ''
+    size = float(size)
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return '%.0f %s' % (size, unit) if unit == 'B' else '%.1f %s' % (size, unit)
+        size = size / 1024
+    return '%.1f GB' % size
+
+
+def formatDuration(seconds):
+    if seconds is None or seconds == '':
+        return ''
+    seconds = float(seconds)
+    if seconds < 60:
+        return '%.1fs' % seconds
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '%dh %02dm %02ds' % (hours, minutes, seconds)
+    return '%dm %02ds' % (minutes, seconds)
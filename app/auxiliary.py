@@ -24,6 +24,7 @@ from PyQt5 import QtGui, QtCore, QtWidgets, Qt
 # from PyQt5.QtCore import *  # for QProcess
 from PyQt5.QtCore import QProcess, QObject, pyqtSlot, Qt
 import subprocess           # for screenshots
+import shutil
 import string               # for input validation
 
 # bubble sort algorithm that sorts an array (in place) based on the values in another array
@@ -43,6 +44,21 @@ def sortArrayWithArray(array, arrayToSort):
         if swap_test == False:
             break
 
+# builds a dictionary that maps the value of a given attribute to the row where it first appears
+# used by the table models to avoid scanning every row when looking up a row by ip, id, name, etc.
+# the index is empty if the rows don't have that column (not every query feeding a model returns all the columns)
+
+
+def buildRowIndex(rows, key):
+    index = dict()
+    for i in range(len(rows)):
+        if not rows[i]:                                                 # skip the empty placeholder row of the default models
+            continue
+        if not key in rows[i].keys():                                   # all the rows come from the same query
+            break
+        index.setdefault(str(rows[i][key]), i)
+    return index
+
 # converts an IP address to an integer (for the sort function)
 
 
@@ -52,6 +68,16 @@ def IP2Int(ip):
     res = (16777216 * o[0]) + (65536 * o[1]) + (256 * o[2]) + o[3]
     return res
 
+# same as IP2Int but returns None for anything that is not an IPv4 address (eg: IPv6 hosts)
+def IP2Key(ip):
+    try:
+        key = IP2Int(str(ip))
+        if 0 <= key < 4294967296:
+            return key
+    except (ValueError, IndexError):
+        pass
+    return None
+
 # checks if a web port is SSL enabled
 
 
@@ -78,6 +104,45 @@ def isHttps(ip, port):
         return True
 
 
+# used to tell if a process from a previous session is still running
+
+
+def isProcessAlive(pid):
+    try:
+        if int(pid) <= 0:
+            return False
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:                                             # it exists but it isn't ours
+        return True
+    except OSError:
+        return False
+    return True
+
+
+# processes run in their own session (see MyQProcess.startInSession) so their process group id is their pid
+
+
+def isProcessGroupLeader(pid):
+    try:
+        return int(pid) > 0 and os.getpgid(int(pid)) == int(pid)
+    except (ValueError, OSError):
+        return False
+
+# returns False if there is no process left in the group
+
+
+def signalProcessGroup(pgid, sig):
+    try:
+        if int(pgid) <= 0:
+            return False
+        os.killpg(int(pgid), sig)
+        return True
+    except (ValueError, OSError):
+        return False
+
+
 def getTimestamp(human=False):
     t = time.time()
     if human:
@@ -205,8 +270,28 @@ class MyQProcess(QProcess):
         self.command = command
         self.starttime = starttime
         self.outputfile = outputfile
+        self.priority = 0
         # has its own display widget to be able to display its output in the GUI
         self.display = textbox
+        # buffers the output for the display widget and keeps the full output on disk (see output.py)
+        self.sink = None
+        # the process group of the command (0 if it doesn't have its own)
+        self.groupId = 0
+
+    # runs the command in a new session so that everything it starts (eg: the tools run by a script) can be signalled at once.
+    # setsid execs the command without forking, so the pid of the process is also its process group id
+    # command: what to run instead of the command (eg: the relay of a remote worker)
+    def startInSession(self, command=None):
+        if command is None:
+            command = self.command
+        if shutil.which('setsid'):
+            self.start('setsid ' + command)
+            # start() doesn't wait for the process, so the pid is not known yet (and setsid may not have run yet either,
+            # but the group will be the pid as soon as it does)
+            if self.waitForStarted():
+                self.groupId = int(self.pid())
+        else:
+            self.start(command)
 
     # this slot allows the process to append its output to the display widget
     @pyqtSlot()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import resource
+
+# this class holds what we know about the machine at a given time (read from /proc)
+
+
+class SystemSample():
+    def __init__(self, load, cpus, memAvailable, fds, fdLimit):
+        self.load = load                    # 1 minute load average
+        self.cpus = cpus
+        self.memAvailable = memAvailable    # in MB
+        self.fds = fds                      # file descriptors open by SPARTA (each running process uses a few)
+        self.fdLimit = fdLimit
+
+    def getLoadPerCPU(self):
+        return self.load / max(1, self.cpus)
+
+    def getFdUsage(self):
+        if self.fdLimit <= 0:
+            return 0
+        return self.fds / self.fdLimit
+
+# returns a SystemSample or None if /proc is not available (eg: not running on linux)
+
+
+def readSystemSample():
+    try:
+        with open('/proc/loadavg', 'r') as f:
+            load = float(f.read().split()[0])
+
+        meminfo = dict()
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0])        # in kB
+        if 'MemAvailable' in meminfo:
+            memAvailable = meminfo['MemAvailable']
+        else:                                               # older kernels
+            memAvailable = meminfo['MemFree'] + meminfo.get('Cached', 0)
+
+        fds = len(os.listdir('/proc/self/fd'))
+        fdLimit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        if fdLimit == resource.RLIM_INFINITY:
+            fdLimit = 0
+        return SystemSample(load, os.cpu_count() or 1, memAvailable / 1024, fds, fdLimit)
+
+    except (IOError, OSError, ValueError, IndexError, KeyError):
+        return None
+
+# this class decides how many processes can run at the same time depending on how busy the machine is.
+# the number of slots goes down quickly when the machine is under pressure (load, memory or file descriptors) and goes
+# up one slot at a time when there is headroom and processes are waiting for a slot. it never leaves [minSlots, maxSlots].
+
+
+class ConcurrencyGovernor():
+    def __init__(self, minSlots=2, maxSlots=40, maxLoad=1.0, minFreeMemory=512, slots=None):
+        self.setBounds(minSlots, maxSlots, maxLoad, minFreeMemory)
+        if slots is None:
+            slots = self.minSlots
+        self.slots = min(self.maxSlots, max(self.minSlots, int(slots)))
+
+    # maxLoad is the load average per CPU we don't want to exceed. minFreeMemory is in MB
+    def setBounds(self, minSlots, maxSlots, maxLoad, minFreeMemory):
+        try:
+            self.minSlots = max(1, int(minSlots))
+            self.maxSlots = max(self.minSlots, int(maxSlots))
+            self.maxLoad = float(maxLoad)
+            self.minFreeMemory = float(minFreeMemory)
+        except (TypeError, ValueError):
+            print('[-] Invalid adaptive scheduling settings. Using the default ones.')
+            self.minSlots, self.maxSlots, self.maxLoad, self.minFreeMemory = 2, 40, 1.0, 512
+        if hasattr(self, 'slots'):
+            self.slots = min(self.maxSlots, max(self.minSlots, self.slots))
+
+    def isUnderPressure(self, sample):
+        return sample.getLoadPerCPU() > self.maxLoad or sample.memAvailable < self.minFreeMemory or sample.getFdUsage() > 0.8
+
+    # leaves some margin so that the number of slots doesn't go up and down all the time
+    def hasHeadroom(self, sample):
+        return sample.getLoadPerCPU() < self.maxLoad * 0.8 and sample.memAvailable > self.minFreeMemory * 1.5 and sample.getFdUsage() < 0.5
+
+    # returns the new number of slots
+    def update(self, sample, running, queued):
+        if sample is None:
+            return self.slots
+        if self.isUnderPressure(sample):
+            self.slots = max(self.minSlots, min(
+                self.slots, int(running * 0.75)))
+        elif self.hasHeadroom(sample) and queued > 0 and running >= self.slots:
+            self.slots = min(self.maxSlots, self.slots + 1)
+        return self.slots
@@ -14,7 +14,7 @@ Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
 import re
 from PyQt5 import QtGui, QtCore
 from PyQt5.QtGui import QFont
-from app.auxiliary import sortArrayWithArray, IP2Int
+from app.auxiliary import sortArrayWithArray, IP2Int, buildRowIndex
 
 
 class HostsTableModel(QtCore.QAbstractTableModel):
@@ -23,9 +23,15 @@ class HostsTableModel(QtCore.QAbstractTableModel):
         QtCore.QAbstractTableModel.__init__(self, parent)
         self.__headers = headers
         self.__hosts = hosts
+        self.updateRowIndexes()
 
     def setHosts(self, hosts):
         self.__hosts = hosts
+        self.updateRowIndexes()
+
+    # must be called every time the rows change or are reordered
+    def updateRowIndexes(self):
+        self.__rowForIp = buildRowIndex(self.__hosts, 'ip')
 
     def rowCount(self, parent):
         return len(self.__hosts)
@@ -166,6 +172,8 @@ class HostsTableModel(QtCore.QAbstractTableModel):
         if order == QtCore.Qt.AscendingOrder:                                  # reverse if needed
             self.__hosts.reverse()
 
+        self.updateRowIndexes()
+
         # update the UI (built-in signal)
         self.layoutChanged.emit()
 
@@ -181,11 +189,9 @@ class HostsTableModel(QtCore.QAbstractTableModel):
         return self.__hosts[row]['checked']
 
     def getHostCheckStatusForIp(self, ip):
-        for i in range(len(self.__hosts)):
-            if str(self.__hosts[i]['ip']) == str(ip):
-                return self.__hosts[i]['checked']
+        row = self.getRowForIp(ip)
+        if row is not None:
+            return self.__hosts[row]['checked']
 
     def getRowForIp(self, ip):
-        for i in range(len(self.__hosts)):
-            if self.__hosts[i]['ip'] == ip:
-                return i
+        return self.__rowForIp.get(str(ip))
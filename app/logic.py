@@ -17,10 +17,12 @@ import ntpath
 import shutil
 import logging      # test
 import subprocess   # for CWD
+import datetime
 from parsers.Parser import *
 from db.database import Database
 from db.tables import *
 from app.auxiliary import *
+from app.resultcache import HostsResultCache, ServiceNamesResultCache, HostDetailsCache
 
 
 class Logic():
@@ -62,6 +64,7 @@ class Logic():
                 self.outputfolder + '/sparta-passwords.txt')
             self.projectname = tf.name
             self.db = Database(self.projectname)
+            self.initResultCaches()
 
         except:
             print('\t[-] Something went wrong creating the temporary files..')
@@ -87,6 +90,86 @@ class Logic():
                 '\t[-] Something went wrong removing temporary files and folders..')
             print("[-] Unexpected error:", sys.exc_info()[0])
 
+    # the hosts and service names are filtered in memory (see resultcache.py) so that toggling filters doesn't hit the DB
+    def initResultCaches(self):
+        self.hostsCache = HostsResultCache(self.db)
+        self.serviceNamesCache = ServiceNamesResultCache(self.db)
+        self.hostDetailsCache = HostDetailsCache(self.db)
+
+    # must be called whenever hosts, ports or services change in the DB (eg: after an nmap import)
+    def invalidateResultCaches(self):
+        self.hostsCache.invalidate()
+        self.serviceNamesCache.invalidate()
+        self.hostDetailsCache.invalidate()
+
+    # returns what the right panel shows for a host (see resultcache.HostDetails) or None if the host doesn't exist
+    def getHostDetails(self, hostId):
+        return self.hostDetailsCache.get(hostId)
+
+    def isHostDetailsCached(self, hostId):
+        return self.hostDetailsCache.contains(hostId)
+
+    # projects created by older versions don't have the ip keys of their hosts
+    def updateHostKeys(self):
+        hosts = self.db.session().query(nmap_host).filter(
+            nmap_host.ip_key == None).all()
+        for h in hosts:
+            h.ip_key = IP2Key(h.ip)
+            self.db.session().add(h)
+        if hosts:
+            self.db.commit()
+
+    def getHostFiltersQuery(self, filters):
+        tmp_query = ''
+        if filters.down == False:
+            tmp_query += ' AND hosts.status!=\'down\''
+        if filters.up == False:
+            tmp_query += ' AND hosts.status!=\'up\''
+        if filters.checked == False:
+            tmp_query += ' AND hosts.checked!=\'True\''
+        for word in filters.keywords:
+            tmp_query += ' AND (hosts.ip LIKE \'%'+sanitise(word)+'%\' OR hosts.os_match LIKE \'%' + \
+                sanitise(word)+'%\' OR hosts.hostname LIKE \'%' + \
+                sanitise(word)+'%\')'
+        return tmp_query
+
+    # returns the subnets (/16 or, within a /16, /24) with the number of hosts, hosts up, open ports and distinct services
+    # hosts without an ip key (eg: IPv6) are grouped in a NULL subnet
+    def getSubnetsFromDB(self, filters, prefix=16, parent=None):
+        size = 2 ** (32 - prefix)
+        tmp_query = ('SELECT hosts.ip_key / ' + str(size) + ' AS subnet, COUNT(DISTINCT hosts.id) AS hosts, ' +
+                     'COUNT(DISTINCT CASE WHEN hosts.status=\'up\' THEN hosts.id END) AS up, ' +
+                     'COUNT(CASE WHEN ports.state=\'open\' THEN ports.id END) AS open, ' +
+                     'COUNT(DISTINCT CASE WHEN ports.state=\'open\' THEN services.name END) AS services ' +
+                     'FROM nmap_host AS hosts ' +
+                     'LEFT OUTER JOIN nmap_port AS ports ON ports.host_id = hosts.id ' +
+                     'LEFT OUTER JOIN nmap_service AS services ON services.id = ports.service_id WHERE 1=1')
+        args = []
+        if parent is not None:
+            tmp_query += ' AND hosts.ip_key / 65536 = ?'
+            args.append(int(parent))
+        tmp_query += self.getHostFiltersQuery(filters)
+        tmp_query += ' GROUP BY subnet ORDER BY subnet'
+        return self.db.metadata.bind.execute(tmp_query, *args).fetchall()
+
+    # returns the hosts of a /24 (or the hosts without an ip key if subnet is None) with the same counts
+    def getHostsForSubnetFromDB(self, filters, subnet):
+        tmp_query = ('SELECT hosts.id, hosts.ip, hosts.hostname, hosts.status, ' +
+                     'COUNT(CASE WHEN ports.state=\'open\' THEN ports.id END) AS open, ' +
+                     'COUNT(DISTINCT CASE WHEN ports.state=\'open\' THEN services.name END) AS services ' +
+                     'FROM nmap_host AS hosts ' +
+                     'LEFT OUTER JOIN nmap_port AS ports ON ports.host_id = hosts.id ' +
+                     'LEFT OUTER JOIN nmap_service AS services ON services.id = ports.service_id WHERE ')
+        args = []
+        if subnet is None:
+            tmp_query += 'hosts.ip_key IS NULL'
+        else:
+            tmp_query += 'hosts.ip_key / 256 = ?'
+            args.append(int(subnet))
+        tmp_query += self.getHostFiltersQuery(filters)
+        tmp_query += ' GROUP BY hosts.id ORDER BY hosts.ip_key, hosts.ip'
+        return self.db.metadata.bind.execute(tmp_query, *args).fetchall()
+
     def createFolderForTool(self, tool):
         if 'nmap' in tool:
             tool = 'nmap'
@@ -94,6 +177,33 @@ class Logic():
         if not os.path.exists(path):
             os.makedirs(path)
 
+    # the full output of each process is written to this file while it runs (see output.py)
+    def getProcessOutputLogFilename(self, procId):
+        path = self.runningfolder+'/output'
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return path+'/'+str(procId)+'.log'
+
+    # returns the full path of a log file stored in the DB (or an empty string for projects that stored the output in the DB)
+    def getProcessOutputLog(self, filename):
+        if not filename:
+            return ''
+        return self.outputfolder+'/'+str(filename)
+
+    # this function moves the output log of a finished process to the 'tool output' folder and returns its new location
+    def moveProcessOutputLog(self, filename):
+        try:
+            path = self.outputfolder+'/output'
+            if not os.path.exists(path):
+                os.makedirs(path)
+            newfilename = path+'/'+ntpath.basename(str(filename))
+            shutil.move(str(filename), newfilename)
+            return newfilename
+        except:
+            print('[-] Something went wrong moving the process output log..')
+            print("[-] Unexpected error:", sys.exc_info()[0])
+            return filename
+
     # this flag is matched to the conf file setting, so that we know if we need to delete the found usernames/passwords wordlists on exit
     def setStoreWordlistsOnExit(self, flag=True):
         self.storeWordlists = flag
@@ -169,6 +279,8 @@ class Logic():
                 suffix="-running", prefix="sparta-")
             # use the new db
             self.db = Database(self.projectname)
+            self.updateHostKeys()
+            self.initResultCaches()
             # update cwd so it appears nicely in the window title
             self.cwd = ntpath.dirname(str(self.projectname))+'/'
 
@@ -202,6 +314,7 @@ class Logic():
 
             # inform the DB to use the new file
             self.db.openDB(str(filename))
+            self.invalidateResultCaches()
             # update cwd so it appears nicely in the window title
             self.cwd = ntpath.dirname(str(filename))+'/'
             self.projectname = str(filename)
@@ -233,52 +346,11 @@ class Logic():
         return False
 
     def getHostsFromDB(self, filters):
-        tmp_query = 'SELECT * FROM nmap_host AS hosts WHERE 1=1'
-
-        if filters.down == False:
-            tmp_query += ' AND hosts.status!=\'down\''
-        if filters.up == False:
-            tmp_query += ' AND hosts.status!=\'up\''
-        if filters.checked == False:
-            tmp_query += ' AND hosts.checked!=\'True\''
-        for word in filters.keywords:
-            tmp_query += ' AND (hosts.ip LIKE \'%'+sanitise(word)+'%\' OR hosts.os_match LIKE \'%' + \
-                sanitise(word)+'%\' OR hosts.hostname LIKE \'%' + \
-                sanitise(word)+'%\')'
-
-        return self.db.metadata.bind.execute(tmp_query).fetchall()
+        return self.hostsCache.filter(filters)
 
     # get distinct service names from DB
     def getServiceNamesFromDB(self, filters):
-        tmp_query = ('SELECT DISTINCT service.name FROM nmap_service as service ' +
-                     'INNER JOIN nmap_port as ports ' +
-                     'INNER JOIN nmap_host AS hosts ' +
-                     'ON hosts.id = ports.host_id AND service.id=ports.service_id WHERE 1=1')
-
-        if filters.down == False:
-            tmp_query += ' AND hosts.status!=\'down\''
-        if filters.up == False:
-            tmp_query += ' AND hosts.status!=\'up\''
-        if filters.checked == False:
-            tmp_query += ' AND hosts.checked!=\'True\''
-        for word in filters.keywords:
-            tmp_query += ' AND (hosts.ip LIKE \'%'+sanitise(word)+'%\' OR hosts.os_match LIKE \'%' + \
-                sanitise(word)+'%\' OR hosts.hostname LIKE \'%' + \
-                sanitise(word)+'%\')'
-        if filters.portopen == False:
-            tmp_query += ' AND ports.state!=\'open\' AND ports.state!=\'open|filtered\''
-        if filters.portclosed == False:
-            tmp_query += ' AND ports.state!=\'closed\''
-        if filters.portfiltered == False:
-            tmp_query += ' AND ports.state!=\'filtered\' AND ports.state!=\'open|filtered\''
-        if filters.tcp == False:
-            tmp_query += ' AND ports.protocol!=\'tcp\''
-        if filters.udp == False:
-            tmp_query += ' AND ports.protocol!=\'udp\''
-
-        tmp_query += ' ORDER BY service.name ASC'
-
-        return self.db.metadata.bind.execute(tmp_query).fetchall()
+        return self.serviceNamesCache.filter(filters)
 
     # get notes for given host IP
     def getNoteFromDB(self, host_id):
@@ -350,6 +422,7 @@ class Logic():
             self.db.session().delete(p)
 
         self.db.commit()
+        self.invalidateResultCaches()
 
     def getHostInformation(self, hostIP):
         return self.db.session().query(nmap_host).filter_by(ip=str(hostIP)).first()
@@ -359,19 +432,8 @@ class Logic():
             'SELECT port.state FROM nmap_port as port WHERE port.host_id=?')
         return self.db.metadata.bind.execute(tmp_query, str(hostID)).fetchall()
 
-    def getHostsAndPortsForServiceFromDB(self, serviceName, filters):
-
-        tmp_query = ('SELECT hosts.ip,ports.port_id,ports.protocol,ports.state,ports.host_id,ports.service_id,services.name,services.product,services.version,services.extrainfo,services.fingerprint FROM nmap_port AS ports ' +
-                     'INNER JOIN nmap_host AS hosts ON hosts.id = ports.host_id ' +
-                     'LEFT OUTER JOIN nmap_service AS services ON services.id=ports.service_id ' +
-                     'WHERE services.name=?')
-
-        if filters.down == False:
-            tmp_query += ' AND hosts.status!=\'down\''
-        if filters.up == False:
-            tmp_query += ' AND hosts.status!=\'up\''
-        if filters.checked == False:
-            tmp_query += ' AND hosts.checked!=\'True\''
+    def getPortFiltersQuery(self, filters):
+        tmp_query = ''
         if filters.portopen == False:
             tmp_query += ' AND ports.state!=\'open\' AND ports.state!=\'open|filtered\''
         if filters.portclosed == False:
@@ -382,12 +444,72 @@ class Logic():
             tmp_query += ' AND ports.protocol!=\'tcp\''
         if filters.udp == False:
             tmp_query += ' AND ports.protocol!=\'udp\''
-        for word in filters.keywords:
-            tmp_query += ' AND (hosts.ip LIKE \'%'+sanitise(word)+'%\' OR hosts.os_match LIKE \'%' + \
-                sanitise(word)+'%\' OR hosts.hostname LIKE \'%' + \
-                sanitise(word)+'%\')'
+        return tmp_query
 
-        return self.db.metadata.bind.execute(tmp_query, str(serviceName)).fetchall()
+    def getHostsAndPortsForServiceQuery(self, columns, filters):
+        tmp_query = ('SELECT ' + columns + ' FROM nmap_port AS ports ' +
+                     'INNER JOIN nmap_host AS hosts ON hosts.id = ports.host_id ' +
+                     'LEFT OUTER JOIN nmap_service AS services ON services.id=ports.service_id ' +
+                     'WHERE services.name=?')
+        return tmp_query + self.getHostFiltersQuery(filters) + self.getPortFiltersQuery(filters)
+
+    # returns one page of the hosts/ports running a service. orderBy is the first key of the order (host, port, protocol or
+    # state), the other keys make the order unique. the next page starts after the keys of the last row of the previous one
+    # (see PagedServicesTableModel.sortKeys for the columns that hold them)
+    def getHostsAndPortsForServiceFromDB(self, serviceName, filters, after=None, limit=None, descending=False, orderBy='host'):
+        ipKey = 'COALESCE(hosts.ip_key, -1)'
+        portKey = 'CAST(ports.port_id AS INTEGER)'
+        protocolKey = "COALESCE(ports.protocol, '')"
+        stateKey = "COALESCE(ports.state, '')"
+        keys = {'host': [ipKey, portKey, 'ports.id'],
+                'port': [portKey, ipKey, 'ports.id'],
+                'protocol': [protocolKey, ipKey, portKey, 'ports.id'],
+                'state': [stateKey, ipKey, portKey, 'ports.id']}.get(orderBy)
+        if keys is None:
+            raise ValueError('[-] The hosts/ports of a service cannot be sorted by ' + str(orderBy))
+
+        tmp_query = self.getHostsAndPortsForServiceQuery('hosts.ip,ports.port_id,ports.protocol,ports.state,ports.host_id,ports.service_id,services.name,services.product,services.version,services.extrainfo,services.fingerprint,' +
+                                                         ipKey + ' AS ip_sort,' + portKey + ' AS port_sort,ports.id AS port_row,' +
+                                                         protocolKey + ' AS protocol_sort,' + stateKey + ' AS state_sort', filters)
+        args = [str(serviceName)]
+
+        op = '>'
+        direction = 'ASC'
+        if descending:
+            op = '<'
+            direction = 'DESC'
+
+        if after is not None:
+            # (k1 > a) OR (k1 = a AND ((k2 > b) OR (k2 = b AND ...)))
+            condition = keys[-1] + op + '?'
+            conditionArgs = [after[-1]]
+            for i in range(len(keys) - 2, -1, -1):
+                condition = '(' + keys[i] + op + '? OR (' + keys[i] + '=? AND ' + condition + '))'
+                conditionArgs = [after[i], after[i]] + conditionArgs
+            tmp_query += ' AND ' + condition
+            args += conditionArgs
+
+        tmp_query += ' ORDER BY ' + ', '.join([k + ' ' + direction for k in keys])
+        if limit is not None:
+            tmp_query += ' LIMIT ' + str(int(limit))
+
+        return self.db.metadata.bind.execute(tmp_query, *args).fetchall()
+
+    def countHostsAndPortsForServiceFromDB(self, serviceName, filters):
+        tmp_query = self.getHostsAndPortsForServiceQuery('COUNT(*)', filters)
+        return self.db.metadata.bind.execute(tmp_query, str(serviceName)).fetchall()[0][0]
+
+    # returns the [ip, port, protocol] of every host/port running a service (not only the rows loaded in the view)
+    # if a tool is given, the hosts/ports we already ran it on are left out
+    def getTargetsForServiceFromDB(self, serviceName, filters, tool=None):
+        tmp_query = self.getHostsAndPortsForServiceQuery(
+            'hosts.ip,ports.port_id,ports.protocol', filters)
+        args = [str(serviceName)]
+        if tool:
+            tmp_query += (' AND NOT EXISTS (SELECT 1 FROM process AS process WHERE process.name=? AND ' +
+                          'process.hostip=hosts.ip AND process.port=ports.port_id AND process.protocol=ports.protocol)')
+            args.append(str(tool))
+        return [[str(t[0]), str(t[1]), str(t[2])] for t in self.db.metadata.bind.execute(tmp_query, *args).fetchall()]
 
     # this function returns all the processes from the DB
     # the showProcesses flag is used to ensure we don't display processes in the process table after we have cleared them or when an existing project is opened.
@@ -400,21 +522,48 @@ class Logic():
 
         # when opening a project, fetch only the processes that have display=false and were not in tabs that were closed by the user
         elif showProcesses == False:
-            tmp_query = ('SELECT process.id, process.hostip, process.tabtitle, process.outputfile, poutput.output FROM process AS process '
-                         'INNER JOIN process_output AS poutput ON process.id = poutput.process_id '
+            # the output is not fetched here, the tabs are restored when the host is selected (see getProcessOutputFromDB)
+            tmp_query = ('SELECT process.id, process.hostip, process.tabtitle, process.outputfile FROM process AS process '
                          'WHERE process.display=? AND process.closed="False" order by process.id desc')
             result = self.db.metadata.bind.execute(
                 tmp_query, str(showProcesses)).fetchall()
 
         # show all the processes in the (bottom) process table (no matter their closed value)
         else:
-            tmp_query = (
-                'SELECT * FROM process AS process WHERE process.display=? order by id desc')
+            tmp_query = ('SELECT process.id, process.display, process.pid, process.name, process.tabtitle, process.hostip, process.port, process.protocol, '
+                         'process.command, process.starttime, process.endtime, process.outputfile, "" AS output, process.status, process.closed, process.priority, '
+                         'process.peak_rss, process.cpu_time, process.wall_time, process.output_bytes '
+                         'FROM process AS process WHERE process.display=? order by id desc')
             result = self.db.metadata.bind.execute(
                 tmp_query, str(showProcesses)).fetchall()
 
         return result
 
+    # returns how long (in seconds) each action took to run in the past, used to tell fast tools from slow ones
+    # all the nmap scans are stored as 'nmap' so they are told apart by their tab title (see Controller.getProcessAction)
+    def getProcessRuntimesFromDB(self):
+        tmp_query = ('SELECT CASE WHEN process.name="nmap" THEN process.tabtitle ELSE process.name END AS name, '
+                     'process.starttime, process.endtime FROM process AS process '
+                     'WHERE process.status="Finished" AND process.name!="screenshooter"')
+        runtimes = dict()
+        for row in self.db.metadata.bind.execute(tmp_query).fetchall():
+            try:
+                start = datetime.datetime.strptime(str(row['starttime']), "%d %b %Y %H:%M:%S")
+                end = datetime.datetime.strptime(str(row['endtime']), "%d %b %Y %H:%M:%S")
+                runtimes.setdefault(str(row['name']), []).append((end - start).total_seconds())
+            except ValueError:
+                pass
+        return runtimes
+
+    # returns the stored output of a process: the log file (newer projects) or the output itself (older projects)
+    def getProcessOutputFromDB(self, procId):
+        tmp_query = ('SELECT poutput.output, poutput.filename, poutput.size FROM process_output AS poutput WHERE poutput.process_id=?')
+        result = self.db.metadata.bind.execute(
+            tmp_query, str(procId)).fetchall()
+        if result:
+            return result[0]
+        return None
+
     def getHostsForTool(self, toolname, closed='False'):
         if closed == 'FetchAll':
             tmp_query = ('SELECT "0", "0", "0", "0", "0", process.hostip, process.port, process.protocol, "0", "0", process.outputfile, "0", "0", "0" FROM process AS process WHERE process.name=?')
@@ -449,12 +598,14 @@ class Logic():
 
             self.db.session().add(h)
             self.db.commit()
+            self.invalidateResultCaches()
 
     # this function adds a new process to the DB
     def addProcessToDB(self, proc):
         print("[DEBUG] Adding process to DB: " + str(proc.name))
         p = process(str(proc.pid()), str(proc.name), str(proc.tabtitle), str(proc.hostip), str(proc.port), str(
             proc.protocol), str(proc.command), proc.starttime, "", str(proc.outputfile), 'Waiting', [process_output()])
+        p.priority = int(proc.priority)
         self.db.session().add(p)
         self.db.commit()
         proc.id = p.id
@@ -467,6 +618,12 @@ class Logic():
         self.db.commit()
         return p.id
 
+    # returns every screenshot taken in this project (including the ones whose tab was closed)
+    def getScreenshotsFromDB(self):
+        tmp_query = ('SELECT process.id, process.hostip, process.port, process.outputfile FROM process AS process '
+                     'WHERE process.name="screenshooter" ORDER BY process.hostip, process.port')
+        return self.db.metadata.bind.execute(tmp_query).fetchall()
+
     # is not actually a toggle function. it sets all the non-running processes display flag to false to ensure they aren't shown in the process table
     # but they need to be shown as tool tabs. this function is called when a user clears the processes or when a project is being closed.
     def toggleProcessDisplayStatus(self, resetAll=False):
@@ -494,12 +651,21 @@ class Logic():
 
     def storeProcessCrashStatusInDB(self, procId):
         proc = self.db.session().query(process).filter_by(id=procId).first()
-        if proc and not proc.status == 'Killed' and not proc.status == 'Cancelled':
+        if proc and not proc.status == 'Killed' and not proc.status == 'Cancelled' and not proc.status == 'TimedOut':
             proc.status = 'Crashed'
             proc.endtime = getTimestamp(True)   # store end time
             self.db.session().add(proc)
             self.db.commit()
 
+    # the process was killed by the watchdog because it ran for too long
+    def storeProcessTimeoutStatusInDB(self, procId):
+        proc = self.db.session().query(process).filter_by(id=procId).first()
+        if proc and proc.status == 'Running':
+            proc.status = 'TimedOut'
+            proc.endtime = getTimestamp(True)   # store end time
+            self.db.session().add(proc)
+            self.db.commit()
+
     # this function updates the status of a process if it is killed
     def storeProcessCancelStatusInDB(self, procId):
         proc = self.db.session().query(process).filter_by(id=procId).first()
@@ -514,9 +680,60 @@ class Logic():
         if proc:
             proc.status = 'Running'
             proc.pid = str(pid)
+            # the process may have been queued for a while, the start time is when it actually started
+            proc.starttime = getTimestamp(True)
+            self.db.session().add(proc)
+            self.db.commit()
+
+    def storeProcessPriorityInDB(self, procId, priority):
+        proc = self.db.session().query(process).filter_by(id=procId).first()
+        if proc:
+            proc.priority = int(priority)
             self.db.session().add(proc)
             self.db.commit()
 
+    def storeProcessUsageInDB(self, procId, peakRss, cpuTime, wallTime, outputBytes):
+        proc = self.db.session().query(process).filter_by(id=procId).first()
+        if proc:
+            # no sample means no figures (NULL), so that the averages of the tool are not dragged down by zeros
+            proc.peak_rss = None if peakRss is None else int(peakRss)
+            proc.cpu_time = None if cpuTime is None else float(cpuTime)
+            proc.wall_time = float(wallTime)
+            proc.output_bytes = int(outputBytes)
+            self.db.session().add(proc)
+            self.db.commit()
+
+    # returns what each tool cost us in this project (only processes that were run by this version of SPARTA are counted)
+    def getToolStatsFromDB(self):
+        tmp_query = ('SELECT process.name, COUNT(*) AS runs, SUM(process.wall_time) AS total_wall_time, AVG(process.wall_time) AS avg_wall_time, '
+                     'MAX(process.wall_time) AS max_wall_time, SUM(process.cpu_time) AS total_cpu_time, AVG(process.cpu_time) AS avg_cpu_time, '
+                     'MAX(process.peak_rss) AS peak_rss, SUM(process.output_bytes) AS output_bytes FROM process AS process '
+                     'WHERE process.wall_time IS NOT NULL GROUP BY process.name ORDER BY total_wall_time DESC')
+        return self.db.metadata.bind.execute(tmp_query).fetchall()
+
+    # the processes that were queued or running when the project was last closed (or when SPARTA crashed), in the order they should run
+    def getInterruptedProcessesFromDB(self):
+        tmp_query = ('SELECT process.id, process.pid, process.name, process.tabtitle, process.hostip, process.port, process.protocol, '
+                     'process.command, process.outputfile, process.status, process.priority FROM process AS process '
+                     'WHERE process.status="Waiting" OR process.status="Running" ORDER BY process.priority DESC, process.id ASC')
+        return self.db.metadata.bind.execute(tmp_query).fetchall()
+
+    # puts a process from a previous session back in the queue (the same row is used so that its tab and output stay linked)
+    def storeProcessResumeInDB(self, proc):
+        p = self.db.session().query(process).filter_by(id=proc.id).first()
+        if p:
+            p.status = 'Waiting'
+            p.display = 'True'
+            p.closed = 'False'
+            p.pid = str(proc.pid())
+            p.command = str(proc.command)
+            p.outputfile = str(proc.outputfile)
+            p.starttime = proc.starttime
+            p.endtime = ''
+            p.priority = int(proc.priority)
+            self.db.session().add(p)
+            self.db.commit()
+
     # change the status in the db as closed
     def storeCloseTabStatusInDB(self, procId):
         proc = self.db.session().query(process).filter_by(id=int(procId)).first()
@@ -525,20 +742,23 @@ class Logic():
             self.db.session().add(proc)
             self.db.commit()
 
-    # this function stores a finished process' output to the DB and updates it status
-    def storeProcessOutputInDB(self, procId, output):
+    # this function stores where to find a finished process' output (the log file, relative to the output folder) and updates its status
+    def storeProcessOutputInDB(self, procId, filename, size, checksum):
         proc = self.db.session().query(process).filter_by(id=procId).first()
         if proc:
             proc_output = self.db.session().query(
                 process_output).filter_by(process_id=procId).first()
             if proc_output:
-                proc_output.output = str(output)
+                proc_output.filename = os.path.relpath(
+                    str(filename), self.outputfolder)
+                proc_output.size = int(size)
+                proc_output.checksum = str(checksum)
                 self.db.session().add(proc_output)
 
             proc.endtime = getTimestamp(True)   # store end time
 
             # if the process has been killed don't change the status to "Finished"
-            if proc.status == "Killed" or proc.status == "Cancelled" or proc.status == "Crashed":
+            if proc.status == "Killed" or proc.status == "Cancelled" or proc.status == "Crashed" or proc.status == "TimedOut":
                 # new: this was missing but maybe this is important here to ensure that we save the process output no matter what
                 self.db.commit()
                 return True
@@ -558,6 +778,7 @@ class Logic():
 
         self.db.session().add(db_note)
         self.db.commit()
+        self.hostDetailsCache.setNote(hostId, str(notes))
 
     def isKilledProcess(self, procId):
         tmp_query = (
@@ -636,6 +857,7 @@ class NmapImporter(QtCore.QThread):
                 if not db_host:                                         # if host doesn't exist in DB, create it first
                     hid = nmap_host('', '', h.ip, h.ipv4, h.ipv6, h.macaddr, h.status, h.hostname,
                                     h.vendor, h.uptime, h.lastboot, h.distance, h.state, h.count)
+                    hid.ip_key = IP2Key(h.ip)
                     self.db.session().add(hid)
                     host_note = note(hid.id, '')
                     self.db.session().add(host_note)
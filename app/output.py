@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import mmap
+import hashlib
+from array import array
+from bisect import bisect_right
+from PyQt5 import QtCore
+from PyQt5.QtCore import QObject, QTimer, QVariant
+from PyQt5.QtGui import QTextCursor
+
+# this class receives the output of a running process. the output is written to a file as it arrives (so that we keep all of it)
+# and is buffered and flushed to the display widget at a fixed rate. the display only keeps the last lines (maximumBlockCount).
+
+
+class OutputSink(QObject):
+    def __init__(self, display, filename, maxLines=5000, interval=100, parent=None):
+        QObject.__init__(self, parent)
+        self.display = display
+        self.filename = filename
+        self.pending = []
+        self.size = 0
+        self.hash = hashlib.sha1()
+        self.file = open(filename, 'w', encoding='ISO-8859-1')
+        # the display widget knows where to find the full output (used by the 'load full output' action)
+        self.display.setProperty('outputLog', QVariant(str(filename)))
+        self.display.setMaximumBlockCount(int(maxLines))
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def write(self, data):
+        if not data:
+            return
+        self.file.write(data)
+        # ISO-8859-1 maps each character to one byte, so this is also the size of the file
+        self.size += len(data)
+        self.hash.update(data.encode('ISO-8859-1', 'replace'))
+        self.pending.append(data)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    # appends the buffered output to the display in one go. the view only follows the output if it was already at the bottom.
+    def flush(self):
+        if not self.pending:
+            return
+        text = ''.join(self.pending)
+        self.pending = []
+        self.file.flush()
+        # in headless mode there is no widget to update (see ui/headless.py)
+        if not self.display.isWidgetType():
+            return
+
+        scrollBar = self.display.verticalScrollBar()
+        follow = scrollBar.value() == scrollBar.maximum()
+        cursor = QTextCursor(self.display.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        if follow:
+            scrollBar.setValue(scrollBar.maximum())
+
+    def close(self):
+        self.timer.stop()
+        self.flush()
+        if not self.file.closed:
+            self.file.close()
+
+    # the file is moved when the process finishes, so the display needs to know the new location
+    def setFilename(self, filename):
+        self.filename = filename
+        self.display.setProperty('outputLog', QVariant(str(filename)))
+
+    def checksum(self):
+        return self.hash.hexdigest()
+
+# returns the output page that starts at the given offset (in bytes), so that big outputs can be read one page at a time
+
+
+def readOutputPage(filename, offset=0, size=65536):
+    try:
+        with open(str(filename), 'r', encoding='ISO-8859-1') as f:
+            f.seek(int(offset))
+            return f.read(int(size))
+    except IOError:
+        return ''
+
+# returns the last lines of the output (up to maxBytes), which is what we show when restoring a tab
+
+
+def readOutputTail(filename, maxBytes=1048576):
+    try:
+        size = os.path.getsize(str(filename))
+        offset = max(0, size - int(maxBytes))
+        page = readOutputPage(filename, offset, maxBytes)
+        if offset > 0:
+            # drop the (probably incomplete) first line
+            page = page[page.find('\n')+1:]
+        return page
+    except OSError:
+        return ''
+
+# compares the file on disk with what we stored in the DB
+
+
+def verifyOutputLog(filename, size, checksum=None):
+    try:
+        if size is not None and os.path.getsize(str(filename)) != int(size):
+            return False
+        if checksum:
+            h = hashlib.sha1()
+            with open(str(filename), 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    h.update(chunk)
+            return h.hexdigest() == str(checksum)
+        return True
+    except (OSError, ValueError):
+        return False
+
+# this class gives access to the lines of an output log without reading it: the file is memory-mapped and an index of
+# line offsets is built (see OutputIndexer). lines are decoded only when they are requested.
+
+
+class MappedOutput():
+    def __init__(self, filename, maxLineLength=4096):
+        self.filename = str(filename)
+        self.maxLineLength = maxLineLength
+        self.file = open(self.filename, 'rb')
+        self.size = os.path.getsize(self.filename)
+        self.map = None
+        # offsets where each line starts
+        self.offsets = array('Q')
+        if self.size > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.offsets.append(0)
+        # number of bytes indexed so far (searches are limited to this part of the file)
+        self.indexed = 0
+
+    def close(self):
+        if self.map:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    # indexes the next chunk of the file and returns False when it is done
+    def indexChunk(self, chunkSize=4194304):
+        end = min(self.indexed + chunkSize, self.size)
+        pos = self.map.find(b'\n', self.indexed, end)
+        while pos != -1:
+            if pos + 1 < self.size:
+                self.offsets.append(pos + 1)
+            pos = self.map.find(b'\n', pos + 1, end)
+        self.indexed = end
+        return self.indexed < self.size
+
+    # number of complete lines indexed so far
+    def lineCount(self):
+        if self.indexed >= self.size:
+            return len(self.offsets)
+        return max(0, len(self.offsets) - 1)
+
+    def line(self, number):
+        start = self.offsets[number]
+        if number + 1 < len(self.offsets):
+            end = self.offsets[number + 1] - 1
+        else:
+            end = self.size
+        end = min(end, start + self.maxLineLength)
+        return self.map[start:end].decode('ISO-8859-1').rstrip('\r\n')
+
+    def lineForOffset(self, offset):
+        return bisect_right(self.offsets, offset) - 1
+
+    # returns the number of the next (or previous) line containing the text, or -1 if there is none
+    def find(self, text, fromLine, backward=False):
+        if not self.map or not text:
+            return -1
+        needle = str(text).encode('ISO-8859-1', 'replace')
+        count = self.lineCount()
+        if count == 0:
+            return -1
+        if backward:
+            if fromLine <= 0:
+                return -1
+            end = self.offsets[fromLine] if fromLine < count else self.indexed
+            pos = self.map.rfind(needle, 0, end)
+        else:
+            if fromLine + 1 >= count:
+                return -1
+            pos = self.map.find(needle, self.offsets[fromLine + 1], self.indexed)
+        if pos == -1:
+            return -1
+        return self.lineForOffset(pos)
+
+# this thread builds the line index of a MappedOutput and reports the number of lines available as it goes
+
+
+class OutputIndexer(QtCore.QThread):
+    tick = QtCore.pyqtSignal(int, name="indexed")
+    done = QtCore.pyqtSignal(name="done")
+
+    def __init__(self, output, parent=None):
+        QtCore.QThread.__init__(self, parent)
+        self.output = output
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        try:
+            while self.output.map and not self.stopped and self.output.indexChunk():
+                self.tick.emit(self.output.lineCount())
+            if not self.stopped:
+                self.tick.emit(self.output.lineCount())
+        except Exception as e:
+            print('[-] Could not index the output of ' + self.output.filename)
+            print(e)
+        self.done.emit()
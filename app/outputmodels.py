@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from PyQt5 import QtCore
+
+# this model exposes the lines of a memory-mapped output log (see app/output.py MappedOutput)
+# the view only asks for the rows that are visible, so only those lines are ever decoded
+
+
+class OutputLinesModel(QtCore.QAbstractListModel):
+
+    def __init__(self, output, parent=None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self.__output = output
+        self.__count = 0
+
+    def getOutput(self):
+        return self.__output
+
+    # called as the line index grows
+    def setLineCount(self, count):
+        if count > self.__count:
+            self.beginInsertRows(QtCore.QModelIndex(), self.__count, count - 1)
+            self.__count = count
+            self.endInsertRows()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.__count
+
+    def data(self, index, role):
+        if role == QtCore.Qt.DisplayRole and index.isValid():
+            return self.__output.line(index.row())
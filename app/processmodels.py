@@ -13,7 +13,8 @@ Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
 
 import re
 from PyQt5 import QtGui, QtCore
-from app.auxiliary import sortArrayWithArray, IP2Int
+from app.auxiliary import sortArrayWithArray, IP2Int, buildRowIndex
+from app.accounting import formatSize, formatDuration
 
 
 class ProcessesTableModel(QtCore.QAbstractTableModel):
@@ -23,9 +24,17 @@ class ProcessesTableModel(QtCore.QAbstractTableModel):
         self.__headers = headers
         self.__processes = processes
         self.__controller = controller
+        self.updateRowIndexes()
 
     def setProcesses(self, processes):
         self.__processes = processes
+        self.updateRowIndexes()
+
+    # must be called every time the rows change or are reordered
+    def updateRowIndexes(self):
+        self.__rowForId = buildRowIndex(self.__processes, 'id')
+        self.__rowForPid = buildRowIndex(self.__processes, 'pid')
+        self.__rowForName = buildRowIndex(self.__processes, 'name')
 
     def getProcesses(self):
         return self.__processes
@@ -90,6 +99,16 @@ class ProcessesTableModel(QtCore.QAbstractTableModel):
                 value = self.__processes[row]['status']
             elif column == 14:
                 value = self.__processes[row]['closed']
+            elif column == 15:
+                value = self.__processes[row]['priority']
+            elif column == 16:
+                value = formatSize(self.__processes[row]['peak_rss'])
+            elif column == 17:
+                value = formatDuration(self.__processes[row]['cpu_time'])
+            elif column == 18:
+                value = formatDuration(self.__processes[row]['wall_time'])
+            elif column == 19:
+                value = formatSize(self.__processes[row]['output_bytes'])
             return value
 
     def sort(self, Ncol, order):
@@ -123,6 +142,15 @@ class ProcessesTableModel(QtCore.QAbstractTableModel):
             for i in range(len(self.__processes)):
                 array.append(self.__processes[i]['endtime'])
 
+        elif Ncol == 15:
+            for i in range(len(self.__processes)):
+                array.append(self.__processes[i]['priority'] or 0)
+
+        elif Ncol in [16, 17, 18, 19]:
+            column = ['peak_rss', 'cpu_time', 'wall_time', 'output_bytes'][Ncol - 16]
+            for i in range(len(self.__processes)):
+                array.append(self.__processes[i][column] or 0)
+
         else:
             for i in range(len(self.__processes)):
                 array.append(self.__processes[i]['status'])
@@ -133,6 +161,8 @@ class ProcessesTableModel(QtCore.QAbstractTableModel):
         if order == QtCore.Qt.AscendingOrder:                                  # reverse if needed
             self.__processes.reverse()
 
+        self.updateRowIndexes()
+
         # to make sure the progress GIF is displayed in the right place
         self.__controller.updateProcessesIcon()
 
@@ -148,43 +178,39 @@ class ProcessesTableModel(QtCore.QAbstractTableModel):
         return self.__processes[row]['pid']
 
     def getProcessPidForId(self, dbId):
-        for i in range(len(self.__processes)):
-            if str(self.__processes[i]['id']) == str(dbId):
-                return self.__processes[i]['pid']
+        row = self.getRowForDBId(dbId)
+        if row is not None:
+            return self.__processes[row]['pid']
 
     def getProcessStatusForRow(self, row):
         return self.__processes[row]['status']
 
     def getProcessStatusForPid(self, pid):
-        for i in range(len(self.__processes)):
-            if str(self.__processes[i]['pid']) == str(pid):
-                return self.__processes[i]['status']
+        row = self.__rowForPid.get(str(pid))
+        if row is not None:
+            return self.__processes[row]['status']
 
     def getProcessStatusForId(self, dbId):
-        for i in range(len(self.__processes)):
-            if str(self.__processes[i]['id']) == str(dbId):
-                return self.__processes[i]['status']
+        row = self.getRowForDBId(dbId)
+        if row is not None:
+            return self.__processes[row]['status']
 
     def getProcessIdForRow(self, row):
         return self.__processes[row]['id']
 
     def getProcessIdForPid(self, pid):
-        for i in range(len(self.__processes)):
-            if str(self.__processes[i]['pid']) == str(pid):
-                return self.__processes[i]['id']
+        row = self.__rowForPid.get(str(pid))
+        if row is not None:
+            return self.__processes[row]['id']
 
     def getToolNameForRow(self, row):
         return self.__processes[row]['name']
 
     def getRowForToolName(self, toolname):
-        for i in range(len(self.__processes)):
-            if self.__processes[i]['name'] == toolname:
-                return i
+        return self.__rowForName.get(str(toolname))
 
     def getRowForDBId(self, dbid):  # new
-        for i in range(len(self.__processes)):
-            if self.__processes[i]['id'] == dbid:
-                return i
+        return self.__rowForId.get(str(dbid))
 
     def getIpForRow(self, row):
         return self.__processes[row]['hostip']
@@ -203,3 +229,65 @@ class ProcessesTableModel(QtCore.QAbstractTableModel):
 
     def getDisplayForRow(self, row):
         return self.__processes[row]['display']
+
+# per tool statistics (how many times it ran, how long it took, how much memory and output it used)
+
+
+class ToolStatsTableModel(QtCore.QAbstractTableModel):
+
+    def __init__(self, stats=[], headers=[], parent=None):
+        QtCore.QAbstractTableModel.__init__(self, parent)
+        self.__headers = headers
+        self.__stats = stats
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return len(self.__stats)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.__headers)
+
+    def headerData(self, section, orientation, role):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            if section < len(self.__headers):
+                return self.__headers[section]
+            return "not implemented"
+
+    def data(self, index, role):
+        if role == QtCore.Qt.DisplayRole:
+            row = self.__stats[index.row()]
+            column = index.column()
+            if column == 0:
+                return row['name']
+            elif column == 1:
+                return row['runs']
+            elif column == 2:
+                return formatDuration(row['total_wall_time'])
+            elif column == 3:
+                return formatDuration(row['avg_wall_time'])
+            elif column == 4:
+                return formatDuration(row['max_wall_time'])
+            elif column == 5:
+                return formatDuration(row['total_cpu_time'])
+            elif column == 6:
+                return formatDuration(row['avg_cpu_time'])
+            elif column == 7:
+                return formatSize(row['peak_rss'])
+            elif column == 8:
+                return formatSize(row['output_bytes'])
+
+    def sort(self, Ncol, order):
+        self.layoutAboutToBeChanged.emit()
+        columns = ['name', 'runs', 'total_wall_time', 'avg_wall_time', 'max_wall_time',
+                   'total_cpu_time', 'avg_cpu_time', 'peak_rss', 'output_bytes']
+        if Ncol == 0:
+            array = [str(s['name']) for s in self.__stats]
+        else:
+            array = [s[columns[Ncol]] or 0 for s in self.__stats]
+        self.__stats = list(self.__stats)
+        sortArrayWithArray(array, self.__stats)
+        if order == QtCore.Qt.AscendingOrder:
+            self.__stats.reverse()
+        self.layoutChanged.emit()
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import time
+import ipaddress
+from bisect import bisect_right
+from collections import Counter
+
+# processes are either 'fast' (banner grabs, snmp checks, etc) or 'slow' (full port scans, nikto, hydra, etc)
+processClasses = ['fast', 'slow']
+
+# default priorities (the higher, the sooner): whatever the user launched, then the first nmap stages (quick results), then
+# the tools launched by the scheduler and finally the full port scans
+defaultPriorities = {'manual': 30, 'staged': 20, 'scheduler': 10, 'fullscan': 0}
+
+# this class decides if a tool is fast or slow. the class configured for the action (see the ProcessClasses settings)
+# always wins, otherwise we look at how long the tool took to run in the past. unknown tools are considered fast.
+
+
+class ProcessClassifier():
+    def __init__(self, classes=None, threshold=60):
+        self.setClasses(classes, threshold)
+        self.runtimes = dict()
+
+    # classes: action -> 'fast'/'slow'. threshold: average runtime (in seconds) above which a tool is slow
+    def setClasses(self, classes, threshold=60):
+        self.classes = dict(classes or {})
+        try:
+            self.threshold = float(threshold)
+        except (TypeError, ValueError):
+            self.threshold = 60
+
+    # runtimes: action -> list of runtimes (in seconds)
+    def setRuntimes(self, runtimes):
+        self.runtimes = dict()
+        for name in runtimes:
+            for seconds in runtimes[name]:
+                self.addRuntime(name, seconds)
+
+    def addRuntime(self, name, seconds):
+        total, count = self.runtimes.get(str(name), [0, 0])
+        self.runtimes[str(name)] = [total + max(0, seconds), count + 1]
+
+    def getAverageRuntime(self, name):
+        if not str(name) in self.runtimes:
+            return None
+        total, count = self.runtimes[str(name)]
+        return total / count
+
+    def classify(self, name):
+        processClass = str(self.classes.get(str(name), '')).lower()
+        if processClass in processClasses:
+            return processClass
+        average = self.getAverageRuntime(name)
+        if average is not None and average >= self.threshold:
+            return 'slow'
+        return 'fast'
+
+# returns the network the target belongs to (the /24 for IPv4, the /64 for IPv6). targets that are not an IP address
+# (eg: the range of a staged nmap) are their own network
+
+
+def getTargetNetwork(target):
+    try:
+        ip = ipaddress.ip_address(str(target))
+        prefix = 24 if ip.version == 4 else 64
+        return str(ipaddress.ip_network(str(ip) + '/' + str(prefix), strict=False))
+    except ValueError:
+        return str(target)
+
+# this class keeps one queue per process class. each class has its own limit of processes running at the same time,
+# so that quick tools keep running while the slow ones take their time.
+# on top of that there are limits per host, per network and per tool, and a budget of processes started per second.
+# the queues are sorted by priority (and by DB id for the same priority) and the next process is the first one that
+# doesn't break any of the limits (not necessarily the oldest one).
+# when there are remote workers (see worker.py) their slots are added to the limit of each pool. the local limits still
+# apply to the processes that run on this machine.
+
+
+class ProcessQueue():
+    def __init__(self, limits):
+        self.queues = dict([(c, []) for c in processClasses])
+        # sort keys of the queued processes, in the same order as the queues
+        self.keys = dict([(c, []) for c in processClasses])
+        self.running = dict([(c, set()) for c in processClasses])
+        self.runningHosts = Counter()
+        self.runningNetworks = Counter()
+        self.runningTools = Counter()
+        self.setLimits(limits)
+        self.setTargetLimits()
+        self.setTotalLimit(0)
+
+    # limits: class -> maximum number of processes of that class running at the same time on this machine
+    # remote: number of processes the remote workers can run at the same time (shared by all the classes)
+    def setLimits(self, limits, remote=0):
+        self.localLimits = dict()
+        for c in processClasses:
+            try:
+                self.localLimits[c] = max(1, int(limits.get(c, 1)))
+            except (TypeError, ValueError):
+                self.localLimits[c] = 1
+        self.remote = self.toLimit(remote)
+        self.limits = dict([(c, self.localLimits[c] + self.remote) for c in processClasses])
+
+    # maximum number of processes running at the same time on this machine in all the pools (0 means no limit)
+    def setTotalLimit(self, limit):
+        self.totalLimit = self.toLimit(limit)
+
+    # 0 means no limit. the rate (processes started per second) can be a fraction (eg: 0.5 is one process every 2 seconds)
+    def setTargetLimits(self, perHost=0, perNetwork=0, perTool=0, rate=0):
+        self.perHost = self.toLimit(perHost)
+        self.perNetwork = self.toLimit(perNetwork)
+        self.perTool = self.toLimit(perTool)
+        try:
+            self.rate = max(0, float(rate))
+        except (TypeError, ValueError):
+            self.rate = 0
+        # token bucket: the budget grows with time up to one second worth of processes
+        self.budget = max(1, self.rate)
+        self.lastRefill = time.time()
+
+    def toLimit(self, value):
+        try:
+            return max(0, int(value))
+        except (TypeError, ValueError):
+            return 0
+
+    def refillBudget(self):
+        now = time.time()
+        if self.rate:
+            self.budget = min(max(1, self.rate), self.budget +
+                              (now - self.lastRefill) * self.rate)
+        self.lastRefill = now
+
+    def put(self, proc, processClass='fast', priority=None):
+        if not processClass in processClasses:
+            processClass = 'fast'
+        proc.processClass = processClass
+        if priority is not None:
+            proc.priority = int(priority)
+        self.insert(proc)
+
+    def insert(self, proc):
+        key = (-getattr(proc, 'priority', 0), int(proc.id))
+        i = bisect_right(self.keys[proc.processClass], key)
+        self.keys[proc.processClass].insert(i, key)
+        self.queues[proc.processClass].insert(i, proc)
+
+    # returns the queued process with the given DB id (or None if it is not waiting)
+    def find(self, dbId):
+        for c in processClasses:
+            for proc in self.queues[c]:
+                if str(proc.id) == str(dbId):
+                    return proc
+        return None
+
+    def setPriority(self, proc, priority):
+        if self.remove(proc):
+            proc.priority = int(priority)
+            self.insert(proc)
+
+    # lowest and highest priority of the queued processes
+    def getPriorityRange(self):
+        priorities = [-k[0] for c in processClasses for k in self.keys[c]]
+        if not priorities:
+            return None, None
+        return min(priorities), max(priorities)
+
+    def isEligible(self, proc):
+        if self.perHost and self.runningHosts[str(proc.hostip)] >= self.perHost:
+            return False
+        if self.perNetwork and self.runningNetworks[getTargetNetwork(proc.hostip)] >= self.perNetwork:
+            return False
+        if self.perTool and self.runningTools[str(proc.name)] >= self.perTool:
+            return False
+        return True
+
+    # returns the next process that can be started (and removes it from the queue) or None if there is none
+    # exclude: classes that can't start more processes for now
+    def next(self, exclude=()):
+        self.refillBudget()
+        if self.rate and self.budget < 1:
+            return None
+        if self.totalLimit and self.runningCount() >= self.totalLimit + self.remote:
+            return None
+        for c in processClasses:
+            if c in exclude or len(self.running[c]) >= self.limits[c]:
+                continue
+            for i in range(len(self.queues[c])):
+                proc = self.queues[c][i]
+                if self.isEligible(proc):
+                    del self.queues[c][i]
+                    del self.keys[c][i]
+                    return proc
+        return None
+
+    # seconds until the budget allows starting another process (0 if it is not the budget that is holding the queue)
+    def waitTime(self):
+        if not self.rate or self.empty():
+            return 0
+        self.refillBudget()
+        return max(0, (1 - self.budget) / self.rate)
+
+    def started(self, proc):
+        self.running[proc.processClass].add(proc)
+        self.runningHosts[str(proc.hostip)] += 1
+        self.runningNetworks[getTargetNetwork(proc.hostip)] += 1
+        self.runningTools[str(proc.name)] += 1
+        if self.rate:
+            self.budget -= 1
+
+    # can be called more than once for the same process (eg: when it crashes and then finishes)
+    def finished(self, proc):
+        running = self.running[getattr(proc, 'processClass', 'fast')]
+        if not proc in running:
+            return
+        running.discard(proc)
+        self.runningHosts[str(proc.hostip)] -= 1
+        self.runningNetworks[getTargetNetwork(proc.hostip)] -= 1
+        self.runningTools[str(proc.name)] -= 1
+
+    # returns False if the process was not in the queue
+    def remove(self, proc):
+        queue = self.queues[getattr(proc, 'processClass', 'fast')]
+        for i in range(len(queue)):
+            if queue[i] is proc:
+                del queue[i]
+                del self.keys[proc.processClass][i]
+                return True
+        return False
+
+    # true if the process can run on this machine (otherwise it has to run on a remote worker)
+    def hasLocalSlot(self, processClass):
+        local = [p for c in processClasses for p in self.running[c] if not getattr(p, 'remote', False)]
+        if self.totalLimit and len(local) >= self.totalLimit:
+            return False
+        return len([p for p in local if p.processClass == processClass]) < self.localLimits[processClass]
+
+    def runningCount(self, processClass=None):
+        if processClass:
+            return len(self.running[processClass])
+        return sum([len(self.running[c]) for c in processClasses])
+
+    def queuedCount(self, processClass=None):
+        if processClass:
+            return len(self.queues[processClass])
+        return sum([len(self.queues[c]) for c in processClasses])
+
+    def empty(self):
+        return self.queuedCount() == 0
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import time
+import traceback
+from PyQt5.QtCore import QObject, QTimer
+
+# this class coalesces UI refresh requests. producers mark regions of the interface as dirty (eg: 'processes', 'hosts')
+# and the scheduler refreshes only those regions, at most once per interval, no matter how many times they were marked.
+# regions can also be marked for a given host (eg: the right panel of one host), in which case the handler receives the hosts.
+
+
+class RefreshScheduler(QObject):
+    def __init__(self, interval=1000, delay=100, parent=None):
+        QObject.__init__(self, parent)
+        # minimum time between two refreshes (ms), ie: the maximum frame rate
+        self.interval = interval
+        # time to wait for more requests before refreshing (ms)
+        self.delay = delay
+        self.handlers = []
+        self.dirty = dict()
+        self.lastRefresh = 0
+        # used to postpone refreshes (eg: while a context menu is showing)
+        self.isBusy = None
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.refresh)
+
+    # handlers are called in the order they were added. each handler receives the set of hosts marked for that region
+    def addHandler(self, region, handler):
+        self.handlers.append([region, handler])
+
+    def setBusyCheck(self, isBusy):
+        self.isBusy = isBusy
+
+    def markDirty(self, region, host=None):
+        hosts = self.dirty.setdefault(region, set())
+        if host is not None:
+            hosts.add(str(host))
+        self.schedule()
+
+    def isDirty(self, region):
+        return region in self.dirty
+
+    def schedule(self, delay=None):
+        if self.timer.isActive():
+            return
+        if delay is None:
+            elapsed = (time.time() - self.lastRefresh) * 1000
+            delay = max(self.delay, int(self.interval - elapsed))
+        self.timer.start(delay)
+
+    # forget pending refreshes (eg: when closing a project)
+    def clear(self):
+        self.timer.stop()
+        self.dirty = dict()
+
+    def refresh(self):
+        if not self.dirty:
+            return
+
+        if self.isBusy and self.isBusy():
+            self.schedule(self.interval)
+            return
+
+        dirty = self.dirty
+        self.dirty = dict()
+        self.lastRefresh = time.time()
+
+        for region, handler in self.handlers:
+            if region in dirty:
+                # one broken view must not stop the others from being refreshed
+                try:
+                    handler(dirty[region])
+                except Exception:
+                    print('[-] Could not refresh the ' + str(region) + ' view.')
+                    traceback.print_exc()
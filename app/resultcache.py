@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from collections import OrderedDict
+
+# these classes keep the last result set fetched from the DB in memory and apply the filters (see auxiliary.Filters) to it
+# the DB is only queried again after the cache has been invalidated (ie: when the underlying data changes)
+# the filters are applied with the same semantics as the SQL they replace (NULL values never pass a != comparison)
+
+
+# SQL: column != value
+def notEqual(column, value):
+    return column is not None and column != value
+
+# SQL: (ip LIKE '%word%' OR os_match LIKE '%word%' OR hostname LIKE '%word%') for every keyword
+
+
+def matchesKeywords(text, keywords):
+    for word in keywords:
+        if not word in text:
+            return False
+    return True
+
+
+def passesHostFilters(filters, status, checked):
+    if filters.down == False and not notEqual(status, 'down'):
+        return False
+    if filters.up == False and not notEqual(status, 'up'):
+        return False
+    if filters.checked == False and not notEqual(checked, 'True'):
+        return False
+    return True
+
+
+def passesPortFilters(filters, state, protocol):
+    if filters.portopen == False and not (notEqual(state, 'open') and notEqual(state, 'open|filtered')):
+        return False
+    if filters.portclosed == False and not notEqual(state, 'closed'):
+        return False
+    if filters.portfiltered == False and not (notEqual(state, 'filtered') and notEqual(state, 'open|filtered')):
+        return False
+    if filters.tcp == False and not notEqual(protocol, 'tcp'):
+        return False
+    if filters.udp == False and not notEqual(protocol, 'udp'):
+        return False
+    return True
+
+
+class ResultCache():
+    def __init__(self, db):
+        self.db = db
+        self.invalidate()
+
+    def setDB(self, db):
+        self.db = db
+        self.invalidate()
+
+    def invalidate(self):
+        self.rows = None
+        self.columns = dict()
+
+    def isValid(self):
+        return self.rows is not None
+
+    # fetches the result set if needed and stores the columns used by the filters in separate lists (faster to scan)
+    def load(self):
+        if self.isValid():
+            return
+        self.rows = self.fetch()
+        self.columns = dict()
+        for c in self.filterColumns:
+            self.columns.update({c: [r[c] for r in self.rows]})
+        # lowercase text used for keyword matching (LIKE is case-insensitive in sqlite)
+        self.columns.update({'keywords': ['\n'.join(
+            [str(r['ip'] or ''), str(r['os_match'] or ''), str(r['hostname'] or '')]).lower() for r in self.rows]})
+
+
+class HostsResultCache(ResultCache):
+    filterColumns = ['status', 'checked']
+
+    def fetch(self):
+        return self.db.metadata.bind.execute('SELECT * FROM nmap_host AS hosts').fetchall()
+
+    def filter(self, filters):
+        self.load()
+        keywords = [str(word).lower() for word in filters.keywords]
+        status = self.columns['status']
+        checked = self.columns['checked']
+        text = self.columns['keywords']
+
+        result = []
+        for i in range(len(self.rows)):
+            if passesHostFilters(filters, status[i], checked[i]) and matchesKeywords(text[i], keywords):
+                result.append(self.rows[i])
+        return result
+
+
+class ServiceNamesResultCache(ResultCache):
+    filterColumns = ['name', 'status', 'checked', 'state', 'protocol']
+
+    def fetch(self):
+        tmp_query = ('SELECT service.name, hosts.status, hosts.checked, hosts.ip, hosts.os_match, hosts.hostname, ports.state, ports.protocol FROM nmap_service as service ' +
+                     'INNER JOIN nmap_port as ports ' +
+                     'INNER JOIN nmap_host AS hosts ' +
+                     'ON hosts.id = ports.host_id AND service.id=ports.service_id')
+        return self.db.metadata.bind.execute(tmp_query).fetchall()
+
+    # returns the distinct service names (sorted by name) in the same format as the rows the model expects
+    def filter(self, filters):
+        self.load()
+        keywords = [str(word).lower() for word in filters.keywords]
+        name = self.columns['name']
+        status = self.columns['status']
+        checked = self.columns['checked']
+        state = self.columns['state']
+        protocol = self.columns['protocol']
+        text = self.columns['keywords']
+
+        names = set()
+        for i in range(len(self.rows)):
+            if name[i] in names:
+                continue
+            if passesHostFilters(filters, status[i], checked[i]) and passesPortFilters(filters, state[i], protocol[i]) and matchesKeywords(text[i], keywords):
+                names.add(name[i])
+
+        # ORDER BY service.name ASC (NULLs first)
+        return [{'name': n} for n in sorted(names, key=lambda n: (n is not None, n or ''))]
+
+# this class keeps everything the right panel shows for the last hosts that were selected (host information, ports and
+# services, scripts and notes), so that going back and forth between hosts doesn't hit the DB every time
+
+
+class HostDetailsCache():
+    def __init__(self, db, maxHosts=200):
+        self.db = db
+        self.maxHosts = maxHosts
+        self.invalidate()
+
+    def setDB(self, db):
+        self.db = db
+        self.invalidate()
+
+    # forget one host or all of them
+    def invalidate(self, hostId=None):
+        if hostId is None:
+            self.hosts = OrderedDict()
+        else:
+            self.hosts.pop(str(hostId), None)
+
+    def contains(self, hostId):
+        return str(hostId) in self.hosts
+
+    def get(self, hostId):
+        hostId = str(hostId)
+        if hostId in self.hosts:
+            self.hosts.move_to_end(hostId)
+            return self.hosts[hostId]
+
+        details = self.fetch(hostId)
+        if details is None:
+            return None
+        self.hosts[hostId] = details
+        while len(self.hosts) > self.maxHosts:
+            self.hosts.popitem(last=False)
+        return details
+
+    def fetch(self, hostId):
+        bind = self.db.metadata.bind
+        host = bind.execute('SELECT hosts.*, notes.text AS note FROM nmap_host AS hosts ' +
+                            'LEFT OUTER JOIN note AS notes ON notes.host_id = hosts.id ' +
+                            'WHERE hosts.id=?', hostId).fetchall()
+        if not host:
+            return None
+
+        ports = bind.execute('SELECT hosts.ip,ports.port_id,ports.protocol,ports.state,ports.host_id,ports.service_id,services.name,services.product,services.version,services.extrainfo,services.fingerprint FROM nmap_port AS ports ' +
+                             'INNER JOIN nmap_host AS hosts ON hosts.id = ports.host_id ' +
+                             'LEFT OUTER JOIN nmap_service AS services ON services.id=ports.service_id ' +
+                             'WHERE hosts.id=?', hostId).fetchall()
+
+        scripts = bind.execute('SELECT host.id,host.script_id,port.port_id,port.protocol FROM nmap_script AS host ' +
+                               'LEFT OUTER JOIN nmap_port AS port ON port.id=host.port_id ' +
+                               'WHERE host.host_id=?', hostId).fetchall()
+
+        # the outputs of all the scripts of the host, so that clicking through the scripts tab doesn't query the DB
+        outputs = bind.execute(
+            'SELECT script.id, script.output FROM nmap_script AS script WHERE script.host_id=?', hostId).fetchall()
+
+        return HostDetails(host[0], ports, scripts, dict([(str(o[0]), o[1]) for o in outputs]))
+
+    # keeps the cached note in sync when the user's notes are saved
+    def setNote(self, hostId, text):
+        if str(hostId) in self.hosts:
+            self.hosts[str(hostId)].note = text
+
+
+class HostDetails():
+    def __init__(self, host, ports, scripts, scriptOutputs):
+        self.host = host
+        self.note = host['note']
+        self.ports = ports
+        self.scripts = scripts
+        # script id -> output
+        self.scriptOutputs = scriptOutputs
+
+    def getScriptOutput(self, scriptId):
+        return self.scriptOutputs.get(str(scriptId))
+
+    def getPorts(self, filters):
+        return [p for p in self.ports if passesPortFilters(filters, p['state'], p['protocol'])]
+
+    # number of open, closed and filtered ports (same logic as the host information tab)
+    def getPortCounts(self):
+        counterOpen = counterClosed = counterFiltered = 0
+        for p in self.ports:
+            if p['state'] == 'open':
+                counterOpen += 1
+            elif p['state'] == 'closed':
+                counterClosed += 1
+            else:
+                counterFiltered += 1
+        return counterOpen, counterClosed, counterFiltered
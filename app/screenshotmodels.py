@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from collections import OrderedDict
+from PyQt5 import QtGui, QtCore
+
+# this model is used by the screenshot gallery. the view only asks for the icons of the visible items: the thumbnails
+# are requested to the thumbnail generator at that point and the item is updated when they are ready.
+# only the last pixmaps used are kept in memory.
+
+
+class ScreenshotsListModel(QtCore.QAbstractListModel):
+
+    def __init__(self, screenshots, folder, generator, iconSize=QtCore.QSize(200, 150), maxPixmaps=500, parent=None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self.__allScreenshots = screenshots
+        self.__screenshots = screenshots
+        self.__folder = str(folder)
+        self.__generator = generator
+        self.__iconSize = iconSize
+        self.__maxPixmaps = maxPixmaps
+        # filename -> QPixmap (least recently used first)
+        self.__pixmaps = OrderedDict()
+        self.__requested = set()
+        self.updateRowIndexes()
+        self.__generator.done.connect(self.thumbnailFinished)
+
+    # must be called when the model is no longer used
+    def close(self):
+        try:
+            self.__generator.done.disconnect(self.thumbnailFinished)
+        except TypeError:
+            pass
+
+    def updateRowIndexes(self):
+        self.__rowForFilename = dict()
+        for i in range(len(self.__screenshots)):
+            self.__rowForFilename.setdefault(self.getFilenameForRow(i), i)
+
+    def getFilenameForRow(self, row):
+        return self.__folder + '/' + str(self.__screenshots[row]['outputfile'])
+
+    def getScreenshotForRow(self, row):
+        return self.__screenshots[row]
+
+    # shows only the screenshots whose ip or port contains the text
+    def setFilter(self, text):
+        text = str(text).strip()
+        self.beginResetModel()
+        if text == '':
+            self.__screenshots = self.__allScreenshots
+        else:
+            self.__screenshots = [s for s in self.__allScreenshots if text in str(
+                s['hostip']) + ':' + str(s['port'])]
+        self.updateRowIndexes()
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.__screenshots)
+
+    def data(self, index, role):
+        if not index.isValid():
+            return None
+        row = index.row()
+
+        if role == QtCore.Qt.DisplayRole:
+            return str(self.__screenshots[row]['hostip']) + ':' + str(self.__screenshots[row]['port'])
+
+        if role == QtCore.Qt.DecorationRole:
+            filename = self.getFilenameForRow(row)
+            if filename in self.__pixmaps:
+                self.__pixmaps.move_to_end(filename)
+                return self.__pixmaps[filename]
+            if not filename in self.__requested:
+                self.__requested.add(filename)
+                # not from within data(): the generator answers right away when the thumbnail already exists
+                QtCore.QTimer.singleShot(
+                    0, lambda: self.__generator.request(filename))
+            return None
+
+        if role == QtCore.Qt.SizeHintRole:
+            return QtCore.QSize(self.__iconSize.width() + 20, self.__iconSize.height() + 40)
+
+    def thumbnailFinished(self, filename, thumbnail):
+        if not filename in self.__requested:
+            return
+        self.__requested.discard(filename)
+        if thumbnail == '':
+            return
+
+        pixmap = QtGui.QPixmap(thumbnail).scaled(
+            self.__iconSize, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        self.__pixmaps[filename] = pixmap
+        while len(self.__pixmaps) > self.__maxPixmaps:
+            self.__pixmaps.popitem(last=False)
+
+        row = self.__rowForFilename.get(filename)
+        if row is not None:
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
@@ -13,7 +13,7 @@ Copyright (c) 2014 SECFORCE (Antonio Quina and Leonidas Stavliotis)
 
 import re
 from PyQt5 import QtGui, QtCore
-from app.auxiliary import sortArrayWithArray
+from app.auxiliary import sortArrayWithArray, buildRowIndex
 
 
 class ScriptsTableModel(QtCore.QAbstractTableModel):
@@ -23,9 +23,15 @@ class ScriptsTableModel(QtCore.QAbstractTableModel):
         self.__headers = headers
         self.__scripts = scripts
         self.__controller = controller
+        self.updateRowIndexes()
 
     def setScripts(self, scripts):
         self.__scripts = scripts
+        self.updateRowIndexes()
+
+    # must be called every time the rows change or are reordered
+    def updateRowIndexes(self):
+        self.__rowForId = buildRowIndex(self.__scripts, 'id')
 
     def getScripts(self):
         return self.__scripts
@@ -85,6 +91,7 @@ class ScriptsTableModel(QtCore.QAbstractTableModel):
         if order == QtCore.Qt.AscendingOrder:                                  # reverse if needed
             self.__scripts.reverse()
 
+        self.updateRowIndexes()
         self.layoutChanged.emit()
 
     # method that allows views to know how to treat each item, eg: if it should be enabled, editable, selectable etc
@@ -97,6 +104,4 @@ class ScriptsTableModel(QtCore.QAbstractTableModel):
         return self.__scripts[row]['id']
 
     def getRowForDBId(self, id):
-        for i in range(len(self.__scripts)):
-            if self.__scripts[i]['id'] == id:
-                return i
+        return self.__rowForId.get(str(id))
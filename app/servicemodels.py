@@ -12,7 +12,7 @@ Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
 '''
 
 from PyQt5 import QtGui, QtCore
-from app.auxiliary import sortArrayWithArray, IP2Int
+from app.auxiliary import sortArrayWithArray, IP2Int, buildRowIndex
 
 
 # needs to inherit from QAbstractTableModel
@@ -26,6 +26,17 @@ class ServicesTableModel(QtCore.QAbstractTableModel):
     def setServices(self, services):
         self.__services = services
 
+    def getServices(self):
+        return self.__services
+
+    # adds rows at the end (used when the rows are fetched page by page)
+    def appendServices(self, services):
+        if len(services) == 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.__services), len(self.__services) + len(services) - 1)
+        self.__services = self.__services + list(services)
+        self.endInsertRows()
+
     def rowCount(self, parent):
         return len(self.__services)
 
@@ -173,15 +184,96 @@ class ServicesTableModel(QtCore.QAbstractTableModel):
     ####################################################################
 
 
+# this model shows the hosts/ports running a service one page at a time. the view asks for the next page (fetchMore)
+# when it scrolls to the end. pages are fetched by key (eg: ip_key, port, port id) so each page costs the same.
+
+
+class PagedServicesTableModel(ServicesTableModel):
+
+    # columns sorted by the DB: column -> [order, columns of the row that hold the keys of that order]
+    sortKeys = {0: ['host', ['ip_sort', 'port_sort', 'port_row']],
+                1: ['port', ['port_sort', 'ip_sort', 'port_row']],
+                2: ['port', ['port_sort', 'ip_sort', 'port_row']],
+                3: ['protocol', ['protocol_sort', 'ip_sort', 'port_sort', 'port_row']],
+                4: ['state', ['state_sort', 'ip_sort', 'port_sort', 'port_row']]}
+
+    def __init__(self, fetchPage, count, headers=[], pageSize=500, parent=None):
+        ServicesTableModel.__init__(self, [], headers, parent)
+        # fetchPage(after, limit, descending, orderBy) returns the rows that come after the given keys
+        self.__fetchPage = fetchPage
+        self.__count = count
+        self.__pageSize = pageSize
+        self.__descending = False
+        self.__sortColumn = 0
+        # keys of the last row fetched (the rows on display may have been sorted since)
+        self.__lastKey = None
+        self.__sortedInMemory = False
+        self.__hasMore = True
+        self.fetchMore(QtCore.QModelIndex())
+
+    def getCount(self):
+        return self.__count
+
+    def canFetchMore(self, parent):
+        if parent.isValid():
+            return False
+        return self.__hasMore
+
+    def fetchMore(self, parent):
+        if parent.isValid() or not self.__hasMore:
+            return
+        orderBy, keyColumns = self.sortKeys[self.__sortColumn]
+        page = self.__fetchPage(self.__lastKey, self.__pageSize, self.__descending, orderBy)
+        self.__hasMore = len(page) == self.__pageSize
+        if len(page) > 0:
+            self.__lastKey = [page[-1][c] for c in keyColumns]
+        self.appendServices(page)
+
+    def headerData(self, section, orientation, role):
+        value = ServicesTableModel.headerData(self, section, orientation, role)
+        # the total is shown up front, even if only the first page is loaded
+        if section == 0 and role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            value = str(value) + ' (' + str(self.__count) + ')'
+        return value
+
+    # sorting by host, port, protocol or state is done by the DB (the rows are fetched again in the new order)
+    # other columns can only sort the rows that are already loaded (the next pages are added at the end)
+    def sort(self, Ncol, order):
+        if not Ncol in self.sortKeys:
+            ServicesTableModel.sort(self, Ncol, order)
+            self.__sortedInMemory = True
+            return
+
+        # same convention as the other models: AscendingOrder shows the highest values first
+        descending = order == QtCore.Qt.AscendingOrder
+        if descending == self.__descending and self.sortKeys[Ncol][0] == self.sortKeys[self.__sortColumn][0] and not self.__sortedInMemory and len(self.getServices()) > 0:
+            return
+        self.beginResetModel()
+        self.__sortedInMemory = False
+        self.__descending = descending
+        self.__sortColumn = Ncol
+        self.__lastKey = None
+        self.__hasMore = True
+        self.setServices([])
+        self.endResetModel()
+        self.fetchMore(QtCore.QModelIndex())
+
+
 class ServiceNamesTableModel(QtCore.QAbstractTableModel):
 
     def __init__(self, serviceNames=[[]], headers=[], parent=None):
         QtCore.QAbstractTableModel.__init__(self, parent)
         self.__headers = headers
         self.__serviceNames = serviceNames
+        self.updateRowIndexes()
 
     def setServices(self, serviceNames):
         self.__serviceNames = serviceNames
+        self.updateRowIndexes()
+
+    # must be called every time the rows change or are reordered
+    def updateRowIndexes(self):
+        self.__rowForName = buildRowIndex(self.__serviceNames, 'name')
 
     def rowCount(self, parent):
         return len(self.__serviceNames)
@@ -230,6 +322,7 @@ class ServiceNamesTableModel(QtCore.QAbstractTableModel):
         if order == QtCore.Qt.AscendingOrder:                                  # reverse if needed
             self.__serviceNames.reverse()
 
+        self.updateRowIndexes()
         self.layoutChanged.emit()
 
     ### getter functions ###
@@ -238,6 +331,4 @@ class ServiceNamesTableModel(QtCore.QAbstractTableModel):
         return self.__serviceNames[row]['name']
 
     def getRowForServiceName(self, serviceNames):
-        for i in range(len(self.__serviceNames)):
-            if self.__serviceNames[i]['name'] == serviceNames:
-                return i
+        return self.__rowForName.get(str(serviceNames))
@@ -45,6 +45,7 @@ class AppSettings():
         self.actions.beginGroup('GeneralSettings')
         self.actions.setValue('default-terminal', 'xterm')
         self.actions.setValue('tool-output-black-background', 'False')
+        self.actions.setValue('tool-output-max-lines', '5000')
         self.actions.setValue('screenshooter-timeout', '15000')
         self.actions.setValue(
             'web-services', 'http,https,ssl,soap,http-proxy,http-alt,https-alt')
@@ -52,6 +53,18 @@ class AppSettings():
         self.actions.setValue('enable-scheduler-on-import', 'False')
         self.actions.setValue('max-fast-processes', '10')
         self.actions.setValue('max-slow-processes', '10')
+        self.actions.setValue('slow-process-threshold', '60')
+        self.actions.setValue('max-processes-per-host', '3')
+        self.actions.setValue('max-processes-per-subnet', '0')
+        self.actions.setValue('max-processes-per-tool', '0')
+        self.actions.setValue('max-process-starts-per-second', '0')
+        self.actions.setValue('adaptive-processes', 'False')
+        self.actions.setValue('adaptive-min-processes', '2')
+        self.actions.setValue('adaptive-max-processes', '40')
+        self.actions.setValue('adaptive-max-load', '1.0')
+        self.actions.setValue('adaptive-min-free-memory', '512')
+        self.actions.setValue('process-timeout', '0')
+        self.actions.setValue('remote-worker-token', '')
         self.actions.endGroup()
 
         self.actions.beginGroup('BruteSettings')
@@ -248,6 +261,31 @@ class AppSettings():
 
         self.actions.endGroup()
 
+        # the pool (fast/slow) in which each action runs. actions that are not listed here are classified by how long they took in the past
+        self.actions.beginGroup('ProcessClasses')
+        self.actions.setValue("nmap-full-tcp", "slow")
+        self.actions.setValue("nmap-full-udp", "slow")
+        self.actions.setValue("nmap-udp-1000", "slow")
+        self.actions.setValue("unicornscan-full-udp", "slow")
+        self.actions.setValue("nikto", "slow")
+        self.actions.setValue("hydra", "slow")
+        self.actions.setValue("banner", "fast")
+        self.actions.endGroup()
+
+        # maximum time (in seconds) each action can run before it is killed. actions that are not listed here use process-timeout (0 means no timeout)
+        self.actions.beginGroup('ProcessTimeouts')
+        self.actions.setValue("banner", "60")
+        self.actions.setValue("smb-enum-users-rpc", "300")
+        self.actions.setValue("smb-null-sessions", "300")
+        self.actions.setValue("finger", "600")
+        self.actions.setValue("rwho", "300")
+        self.actions.setValue("showmount", "300")
+        self.actions.endGroup()
+
+        # machines that run tools for SPARTA (see app/worker.py): name=host:port:slots. there are none by default
+        self.actions.beginGroup('RemoteWorkers')
+        self.actions.endGroup()
+
         self.actions.sync()
 
     # NOTE: the weird order of elements in the functions below is due to historical reasons. Change this some day.
@@ -343,6 +381,33 @@ class AppSettings():
         self.actions.endGroup()
         return settings
 
+    def getProcessClasses(self):
+        settings = dict()
+        self.actions.beginGroup('ProcessClasses')
+        keys = self.actions.childKeys()
+        for k in keys:
+            settings.update({str(k): str(self.actions.value(k))})
+        self.actions.endGroup()
+        return settings
+
+    def getProcessTimeouts(self):
+        settings = dict()
+        self.actions.beginGroup('ProcessTimeouts')
+        keys = self.actions.childKeys()
+        for k in keys:
+            settings.update({str(k): str(self.actions.value(k))})
+        self.actions.endGroup()
+        return settings
+
+    def getRemoteWorkers(self):
+        settings = dict()
+        self.actions.beginGroup('RemoteWorkers')
+        keys = self.actions.childKeys()
+        for k in keys:
+            settings.update({str(k): str(self.actions.value(k))})
+        self.actions.endGroup()
+        return settings
+
     def getSchedulerSettings_old(self):
         settings = dict()
         self.actions.beginGroup('SchedulerSettings')
@@ -364,6 +429,8 @@ class AppSettings():
                               newSettings.general_default_terminal)
         self.actions.setValue('tool-output-black-background',
                               newSettings.general_tool_output_black_background)
+        self.actions.setValue('tool-output-max-lines',
+                              newSettings.general_tool_output_max_lines)
         self.actions.setValue('screenshooter-timeout',
                               newSettings.general_screenshooter_timeout)
         self.actions.setValue('web-services', newSettings.general_web_services)
@@ -375,6 +442,30 @@ class AppSettings():
                               newSettings.general_max_fast_processes)
         self.actions.setValue('max-slow-processes',
                               newSettings.general_max_slow_processes)
+        self.actions.setValue('slow-process-threshold',
+                              newSettings.general_slow_process_threshold)
+        self.actions.setValue('max-processes-per-host',
+                              newSettings.general_max_processes_per_host)
+        self.actions.setValue('max-processes-per-subnet',
+                              newSettings.general_max_processes_per_subnet)
+        self.actions.setValue('max-processes-per-tool',
+                              newSettings.general_max_processes_per_tool)
+        self.actions.setValue('max-process-starts-per-second',
+                              newSettings.general_max_process_starts_per_second)
+        self.actions.setValue('adaptive-processes',
+                              newSettings.general_adaptive_processes)
+        self.actions.setValue('adaptive-min-processes',
+                              newSettings.general_adaptive_min_processes)
+        self.actions.setValue('adaptive-max-processes',
+                              newSettings.general_adaptive_max_processes)
+        self.actions.setValue('adaptive-max-load',
+                              newSettings.general_adaptive_max_load)
+        self.actions.setValue('adaptive-min-free-memory',
+                              newSettings.general_adaptive_min_free_memory)
+        self.actions.setValue('process-timeout',
+                              newSettings.general_process_timeout)
+        self.actions.setValue('remote-worker-token',
+                              newSettings.general_remote_worker_token)
         self.actions.endGroup()
 
         self.actions.beginGroup('BruteSettings')
@@ -428,6 +519,21 @@ class AppSettings():
             self.actions.setValue(tool, newSettings.automatedAttacks[tool])
         self.actions.endGroup()
 
+        self.actions.beginGroup('ProcessClasses')
+        for action in newSettings.processClasses:
+            self.actions.setValue(action, newSettings.processClasses[action])
+        self.actions.endGroup()
+
+        self.actions.beginGroup('ProcessTimeouts')
+        for action in newSettings.processTimeouts:
+            self.actions.setValue(action, newSettings.processTimeouts[action])
+        self.actions.endGroup()
+
+        self.actions.beginGroup('RemoteWorkers')
+        for worker in newSettings.remoteWorkers:
+            self.actions.setValue(worker, newSettings.remoteWorkers[worker])
+        self.actions.endGroup()
+
         self.actions.sync()
 
 # This class first sets all the default settings and then overwrites them with the settings found in the configuration file
@@ -439,11 +545,28 @@ class Settings():
         # general
         self.general_default_terminal = "gnome-terminal"
         self.general_tool_output_black_background = "False"
+        self.general_tool_output_max_lines = "5000"
         self.general_screenshooter_timeout = "15000"
         self.general_web_services = "http,https,ssl,soap,http-proxy,http-alt,https-alt"
         self.general_enable_scheduler = "True"
         self.general_max_fast_processes = "10"
         self.general_max_slow_processes = "10"
+        self.general_slow_process_threshold = "60"
+        # 0 means no limit
+        self.general_max_processes_per_host = "3"
+        self.general_max_processes_per_subnet = "0"
+        self.general_max_processes_per_tool = "0"
+        self.general_max_process_starts_per_second = "0"
+        # adaptive scheduling: the number of processes depends on the load (per CPU), the free memory (MB) and the open files
+        self.general_adaptive_processes = "False"
+        self.general_adaptive_min_processes = "2"
+        self.general_adaptive_max_processes = "40"
+        self.general_adaptive_max_load = "1.0"
+        self.general_adaptive_min_free_memory = "512"
+        # in seconds, 0 means no timeout
+        self.general_process_timeout = "0"
+        # shared with the remote workers (see app/worker.py)
+        self.general_remote_worker_token = ""
 
         # brute
         self.brute_store_cleartext_passwords_on_exit = "True"
@@ -472,6 +595,9 @@ class Settings():
         self.portTerminalActions = []
         self.stagedNmapSettings = []
         self.automatedAttacks = []
+        self.processClasses = dict()
+        self.remoteWorkers = dict()
+        self.processTimeouts = dict()
 
         # now that all defaults are set, overwrite with whatever was in the .conf file (stored in appSettings)
         if appSettings:
@@ -485,6 +611,37 @@ class Settings():
                 self.portTerminalActions = appSettings.getPortTerminalActions()
                 self.automatedAttacks = appSettings.getSchedulerSettings()
 
+                # settings added after 2.0 are optional (older conf files don't have them)
+                self.general_tool_output_max_lines = self.generalSettings.get(
+                    'tool-output-max-lines', self.general_tool_output_max_lines)
+                self.general_slow_process_threshold = self.generalSettings.get(
+                    'slow-process-threshold', self.general_slow_process_threshold)
+                self.general_max_processes_per_host = self.generalSettings.get(
+                    'max-processes-per-host', self.general_max_processes_per_host)
+                self.general_max_processes_per_subnet = self.generalSettings.get(
+                    'max-processes-per-subnet', self.general_max_processes_per_subnet)
+                self.general_max_processes_per_tool = self.generalSettings.get(
+                    'max-processes-per-tool', self.general_max_processes_per_tool)
+                self.general_max_process_starts_per_second = self.generalSettings.get(
+                    'max-process-starts-per-second', self.general_max_process_starts_per_second)
+                self.general_adaptive_processes = self.generalSettings.get(
+                    'adaptive-processes', self.general_adaptive_processes)
+                self.general_adaptive_min_processes = self.generalSettings.get(
+                    'adaptive-min-processes', self.general_adaptive_min_processes)
+                self.general_adaptive_max_processes = self.generalSettings.get(
+                    'adaptive-max-processes', self.general_adaptive_max_processes)
+                self.general_adaptive_max_load = self.generalSettings.get(
+                    'adaptive-max-load', self.general_adaptive_max_load)
+                self.general_adaptive_min_free_memory = self.generalSettings.get(
+                    'adaptive-min-free-memory', self.general_adaptive_min_free_memory)
+                self.general_process_timeout = self.generalSettings.get(
+                    'process-timeout', self.general_process_timeout)
+                self.processTimeouts = appSettings.getProcessTimeouts()
+                self.general_remote_worker_token = self.generalSettings.get(
+                    'remote-worker-token', self.general_remote_worker_token)
+                self.remoteWorkers = appSettings.getRemoteWorkers()
+                self.processClasses = appSettings.getProcessClasses()
+
                 # general
                 self.general_default_terminal = self.generalSettings['default-terminal']
                 self.general_tool_output_black_background = self.generalSettings[
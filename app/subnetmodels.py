@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from PyQt5 import QtCore
+
+# this model shows the hosts grouped by /16 and /24 subnets. the counts of each subnet are aggregated in the DB and the
+# children of a node are only fetched when it is expanded, so the initial cost depends on the number of /16 subnets.
+
+
+class SubnetNode():
+    def __init__(self, kind, key, label, counts, parent=None):
+        # 'subnet16', 'subnet24', 'other' (hosts without an ip key) or 'host'
+        self.kind = kind
+        self.key = key
+        self.label = label
+        # [hosts, up, open ports, services]
+        self.counts = counts
+        self.parent = parent
+        # None until the children have been fetched
+        self.children = None
+
+    def row(self):
+        if self.parent is None or self.parent.children is None:
+            return 0
+        return self.parent.children.index(self)
+
+
+def getSubnetLabel(key, prefix):
+    if key is None:
+        return 'Other'
+    if prefix == 16:
+        return '%d.%d.0.0/16' % (key >> 8, key & 255)
+    return '%d.%d.%d.0/24' % (key >> 16, (key >> 8) & 255, key & 255)
+
+
+class SubnetsTreeModel(QtCore.QAbstractItemModel):
+
+    def __init__(self, controller, filters, headers=[], parent=None):
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self.__controller = controller
+        self.__filters = filters
+        self.__headers = headers
+        self.__root = SubnetNode('root', None, '', [])
+        self.__root.children = []
+        for s in self.__controller.getSubnetsFromDB(self.__filters, 16):
+            kind = 'subnet16'
+            if s['subnet'] is None:
+                kind = 'other'
+            self.__root.children.append(SubnetNode(kind, s['subnet'], getSubnetLabel(
+                s['subnet'], 16), [s['hosts'], s['up'], s['open'], s['services']], self.__root))
+
+    def getNode(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self.__root
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self.getNode(parent)
+        if node.children is None or row < 0 or row >= len(node.children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        node = index.internalPointer().parent
+        if node is None or node is self.__root:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row(), 0, node)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.getNode(parent)
+        if node.children is None:
+            return 0
+        return len(node.children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.__headers)
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.getNode(parent)
+        if node.kind == 'host':
+            return False
+        if node.children is None:
+            return True
+        return len(node.children) > 0
+
+    def canFetchMore(self, parent):
+        node = self.getNode(parent)
+        return node.kind != 'host' and node.children is None
+
+    def fetchMore(self, parent):
+        node = self.getNode(parent)
+        if node.kind == 'host' or node.children is not None:
+            return
+
+        children = []
+        if node.kind == 'subnet16':
+            for s in self.__controller.getSubnetsFromDB(self.__filters, 24, node.key):
+                children.append(SubnetNode('subnet24', s['subnet'], getSubnetLabel(
+                    s['subnet'], 24), [s['hosts'], s['up'], s['open'], s['services']], node))
+        else:
+            for h in self.__controller.getHostsForSubnetFromDB(self.__filters, node.key):
+                label = str(h['ip'])
+                if h['hostname']:
+                    label += ' (' + str(h['hostname']) + ')'
+                children.append(SubnetNode('host', str(h['ip']), label, [
+                                '', h['status'], h['open'], h['services']], node))
+
+        if children:
+            self.beginInsertRows(parent, 0, len(children) - 1)
+            node.children = children
+            self.endInsertRows()
+        else:
+            node.children = children
+
+    def headerData(self, section, orientation, role):
+        if role == QtCore.Qt.DisplayRole:
+            if orientation == QtCore.Qt.Horizontal:
+                if section < len(self.__headers):
+                    return self.__headers[section]
+                else:
+                    return "not implemented"
+
+    def data(self, index, role):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+
+        if role == QtCore.Qt.DisplayRole:
+            if index.column() == 0:
+                return node.label
+            return str(node.counts[index.column() - 1])
+
+        if role == QtCore.Qt.TextAlignmentRole and index.column() > 0:
+            return QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+    ### getter functions ###
+
+    # returns the ip of the host at the index (or None if it is a subnet)
+    def getHostIPForIndex(self, index):
+        node = self.getNode(index)
+        if node.kind == 'host':
+            return node.key
+        return None
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import ntpath
+from PyQt5 import QtCore
+from PyQt5.QtGui import QImageReader
+
+# screenshots can be huge (full page captures), so we display downscaled previews that are generated once and stored
+# in a 'thumbnails' folder next to the screenshots. the previews show the top of the page.
+
+THUMBNAIL_WIDTH = 400
+THUMBNAIL_MAX_HEIGHT = 600
+
+
+def getThumbnailFilename(filename):
+    filename = str(filename)
+    return os.path.join(os.path.dirname(filename), 'thumbnails', ntpath.basename(filename))
+
+# decodes the screenshot directly at the thumbnail size (the jpeg decoder can skip most of the work) and saves it
+# returns the name of the thumbnail or an empty string if the screenshot could not be read
+
+
+def createThumbnail(filename):
+    thumbnail = getThumbnailFilename(filename)
+    if os.path.isfile(thumbnail):
+        return thumbnail
+
+    reader = QImageReader(str(filename))
+    size = reader.size()
+    if not size.isValid() or size.width() == 0:
+        return ''
+
+    if size.width() > THUMBNAIL_WIDTH:
+        height = int(size.height() * THUMBNAIL_WIDTH / size.width())
+        reader.setScaledSize(QtCore.QSize(THUMBNAIL_WIDTH, max(1, height)))
+        size = reader.scaledSize()
+    if size.height() > THUMBNAIL_MAX_HEIGHT:
+        reader.setScaledClipRect(QtCore.QRect(0, 0, size.width(), THUMBNAIL_MAX_HEIGHT))
+
+    image = reader.read()
+    if image.isNull():
+        return ''
+
+    try:
+        if not os.path.exists(os.path.dirname(thumbnail)):
+            os.makedirs(os.path.dirname(thumbnail))
+    except OSError:
+        pass
+    if not image.save(thumbnail, 'JPG'):
+        print('[-] Could not save thumbnail: ' + thumbnail)
+        return ''
+    return thumbnail
+
+
+class ThumbnailSignals(QtCore.QObject):
+    done = QtCore.pyqtSignal(str, str, name="done")
+
+
+class ThumbnailTask(QtCore.QRunnable):
+    def __init__(self, filename, signals):
+        QtCore.QRunnable.__init__(self)
+        self.filename = filename
+        self.signals = signals
+
+    def run(self):
+        try:
+            thumbnail = createThumbnail(self.filename)
+        except Exception as e:
+            print('[-] Could not create the thumbnail for ' + str(self.filename))
+            print(e)
+            thumbnail = ''
+        self.signals.done.emit(self.filename, thumbnail)
+
+# generates thumbnails in a pool of worker threads. the done signal is sent with the screenshot and thumbnail filenames
+# (the thumbnail filename is empty if it could not be created)
+
+
+class ThumbnailGenerator(QtCore.QObject):
+    done = QtCore.pyqtSignal(str, str, name="done")
+
+    def __init__(self, threads=2, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self.pool = QtCore.QThreadPool()
+        self.pool.setMaxThreadCount(threads)
+        self.pending = set()
+        self.signals = ThumbnailSignals()
+        self.signals.done.connect(self.finished)
+
+    def request(self, filename):
+        filename = str(filename)
+        if filename in self.pending:
+            return
+        thumbnail = getThumbnailFilename(filename)
+        if os.path.isfile(thumbnail):
+            self.done.emit(filename, thumbnail)
+            return
+        self.pending.add(filename)
+        self.pool.start(ThumbnailTask(filename, self.signals))
+
+    def finished(self, filename, thumbnail):
+        self.pending.discard(filename)
+        self.done.emit(filename, thumbnail)
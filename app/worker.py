@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os
+import sys
+import json
+import time
+import hmac
+import hashlib
+import shlex
+import base64
+import signal
+import shutil
+import secrets
+import argparse
+import tempfile
+import threading
+import subprocess
+import socket
+import socketserver
+
+# remote workers run the tools on other machines so that a big scope doesn't depend on the CPU and bandwidth of one box.
+#
+# on each worker machine, run the agent from a SPARTA folder (the commands use the same tools and scripts):
+#   python3 app/worker.py serve -l <address of the worker>:7007 -s 8 -t <token>
+# and add the worker to the RemoteWorkers group of sparta.conf (name=host:port:slots) with the same remote-worker-token.
+# several agents can run on the same machine (eg: to test with 127.0.0.1:7007, 127.0.0.1:7008, etc).
+# the token is never sent but the commands and their output are not encrypted: on an untrusted network, leave the agent
+# on 127.0.0.1 and reach it through an SSH tunnel (ssh -L 7007:127.0.0.1:7007 worker).
+#
+# SPARTA doesn't talk to the workers directly: the process started for a remote job is a relay (this script in relay
+# mode) that sends the job to the agent, prints the output of the tool as it arrives, writes the files the tool created
+# in the running folder and exits with the exit code of the tool. so the processes table, the output logs, the timeouts
+# and the nmap imports work the same as for local processes.
+#
+# the protocol is one JSON message per line:
+#   agent -> relay: {"type": "challenge", "nonce"} as soon as the relay connects
+#   relay -> agent: {"type": "run", "job": {"command", "target", "outputfile", "folder"}, "hmac"} and {"type": "kill"}
+#   agent -> relay: {"type": "output", "data"}, {"type": "file", "path", "data"} (base64), {"type": "finished", "exitcode"}
+#                   or {"type": "busy"} / {"type": "error", "message"} instead of running the job
+# the agent runs whatever it is sent, so it listens on 127.0.0.1 by default and only runs jobs signed with the token. the
+# signature covers the nonce, which is new for every connection, so a job that was sniffed can't be sent again.
+
+# exit code of the relay when the worker can't take the job (unreachable or busy). the reason is written to stderr, which
+# is how SPARTA tells it apart from a tool that exits with the same code (the output of the tool goes to stdout)
+unavailableExitCode = 75
+
+# seconds a worker is not used for after it couldn't take a job
+disableTime = 60
+
+
+def sendMessage(conn, message):
+    conn.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+# the signature of a job for a given nonce (see the protocol above)
+
+
+def signJob(token, nonce, job):
+    payload = str(nonce) + json.dumps(job, sort_keys=True)
+    return hmac.new(str(token).encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+# returns None when the connection is closed
+
+
+def readMessage(f):
+    line = f.readline()
+    if not line:
+        return None
+    try:
+        return json.loads(line.decode('utf-8'))
+    except ValueError:
+        return None
+
+# returns [host, port] from host:port (the host can be an IPv6 address)
+
+
+def splitAddress(address):
+    host, port = str(address).rsplit(':', 1)
+    return [host.strip('[]'), int(port)]
+
+#################### SPARTA SIDE ####################
+
+# a worker as configured in the settings: host:port:slots (slots is the number of jobs it can run at the same time)
+
+
+class RemoteWorker():
+    def __init__(self, name, host, port, slots=4):
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.slots = max(1, int(slots))
+        self.running = 0
+        self.disabledUntil = 0
+
+    def getAddress(self):
+        if ':' in self.host:
+            return '[' + self.host + ']:' + str(self.port)
+        return self.host + ':' + str(self.port)
+
+    def isAvailable(self):
+        return time.time() >= self.disabledUntil
+
+    def freeSlots(self):
+        if not self.isAvailable():
+            return 0
+        return max(0, self.slots - self.running)
+
+# the workers SPARTA can send jobs to. each job goes to the worker with the most free slots.
+
+
+class WorkerPool():
+    def __init__(self, workers=None, token=''):
+        self.workers = []
+        self.setWorkers(workers, token)
+
+    # workers: name -> host:port:slots (see the RemoteWorkers settings)
+    def setWorkers(self, workers, token=''):
+        self.token = str(token)
+        previous = dict([(w.getAddress(), w) for w in self.workers])
+        self.workers = []
+        for name in sorted(workers or {}):
+            try:
+                address, slots = str(workers[name]).rsplit(':', 1)
+                host, port = splitAddress(address)
+                worker = RemoteWorker(name, host, port, slots)
+            except ValueError:
+                print('[-] Invalid remote worker: ' + str(name) + '=' + str(workers[name]) + ' (the format is host:port:slots)')
+                continue
+            # jobs that are still running on it will free their slot when they finish
+            if worker.getAddress() in previous:
+                worker.running = previous[worker.getAddress()].running
+            self.workers.append(worker)
+
+    # total number of jobs the workers can run at the same time
+    def capacity(self):
+        return sum([w.slots for w in self.workers])
+
+    def hasFreeSlot(self):
+        return any([w.freeSlots() > 0 for w in self.workers])
+
+    # returns the worker that will run the job (or None if they are all busy)
+    def acquire(self):
+        workers = [w for w in self.workers if w.freeSlots() > 0]
+        if not workers:
+            return None
+        worker = max(workers, key=lambda w: (w.freeSlots(), -w.running))
+        worker.running += 1
+        return worker
+
+    def release(self, worker):
+        worker.running = max(0, worker.running - 1)
+
+    def disable(self, worker):
+        print('[-] The remote worker ' + worker.getAddress() + ' could not take a job. It will not be used for ' +
+              str(disableTime) + ' seconds.')
+        worker.disabledUntil = time.time() + disableTime
+
+    # the command SPARTA runs instead of the tool. folder is the running folder (the tool output is written there)
+    def getRelayCommand(self, worker, proc, folder):
+        job = {'command': proc.command, 'target': proc.hostip,
+               'outputfile': proc.outputfile, 'folder': folder}
+        encoded = base64.b64encode(json.dumps(job).encode('utf-8')).decode('ascii')
+        return '"' + sys.executable + '" "' + os.path.abspath(__file__) + '" relay ' + worker.getAddress() + ' ' + encoded
+
+# sends the job to the agent and relays what comes back. returns the exit code of the tool
+
+
+def relayJob(address, job, token):
+    out = sys.stdout.buffer
+
+    def write(text):
+        out.write(text.encode('ISO-8859-1', 'replace'))
+        out.flush()
+
+    # the job didn't run, so SPARTA puts it back in the queue
+    def unavailable(reason):
+        sys.stderr.write('[-] The remote worker ' + str(address) + ' ' + reason + '\n')
+        sys.stderr.flush()
+        return unavailableExitCode
+
+    try:
+        host, port = splitAddress(address)
+        conn = socket.create_connection((host, port), timeout=10)
+        f = conn.makefile('rb')
+        challenge = readMessage(f)
+        if not challenge or not challenge.get('type') == 'challenge':
+            return unavailable('did not send a challenge.')
+        conn.settimeout(None)
+        sendMessage(conn, {'type': 'run', 'job': job, 'hmac': signJob(token, challenge.get('nonce', ''), job)})
+    except (OSError, ValueError) as e:
+        return unavailable('could not be reached: ' + str(e))
+
+    # when SPARTA kills the process (or it times out) the tool is killed on the worker
+    def kill(signum, frame):
+        try:
+            sendMessage(conn, {'type': 'kill'})
+        except OSError:
+            pass
+    signal.signal(signal.SIGTERM, kill)
+    signal.signal(signal.SIGINT, kill)
+
+    folder = os.path.normpath(str(job['folder']))
+    while True:
+        message = readMessage(f)
+        if message is None:
+            write('\n[-] Lost the connection to the remote worker ' + str(address) + '\n')
+            return 1
+        kind = message.get('type')
+        if kind == 'output':
+            write(str(message.get('data', '')))
+        elif kind == 'file':
+            # the tool can only write in the running folder
+            path = os.path.normpath(os.path.join(folder, str(message.get('path', ''))))
+            if not path.startswith(folder + os.sep):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as output:
+                output.write(base64.b64decode(message.get('data', '')))
+        elif kind == 'finished':
+            return int(message.get('exitcode', 1))
+        elif kind == 'busy':
+            return unavailable('is busy.')
+        else:
+            write('[-] The remote worker ' + str(address) + ' refused the job: ' + str(message.get('message', '')) + '\n')
+            return 1
+
+#################### WORKER SIDE ####################
+
+# runs the jobs sent by SPARTA (up to slots at the same time). each job runs in its own temporary folder which replaces
+# SPARTA's running folder in the command.
+
+
+class WorkerAgent():
+    def __init__(self, token, slots=4):
+        self.token = str(token)
+        self.slots = max(1, int(slots))
+        self.running = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.running >= self.slots:
+                return False
+            self.running += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.running -= 1
+
+    def handle(self, conn):
+        f = conn.makefile('rb')
+        try:
+            nonce = secrets.token_hex(16)
+            sendMessage(conn, {'type': 'challenge', 'nonce': nonce})
+            message = readMessage(f)
+            job = None
+            if message and message.get('type') == 'run':
+                job = message.get('job')
+            if not isinstance(job, dict) or not 'command' in job or not 'folder' in job:
+                sendMessage(conn, {'type': 'error', 'message': 'invalid job'})
+                return
+            if not hmac.compare_digest(str(message.get('hmac', '')), signJob(self.token, nonce, job)):
+                print('[-] Job refused (invalid signature) from ' + str(conn.getpeername()[0]))
+                sendMessage(conn, {'type': 'error', 'message': 'invalid signature'})
+                return
+            if not self.acquire():
+                sendMessage(conn, {'type': 'busy'})
+                return
+            try:
+                self.runJob(conn, f, job)
+            finally:
+                self.release()
+        except OSError:
+            pass                                    # SPARTA went away
+
+    def runJob(self, conn, f, job):
+        workdir = tempfile.mkdtemp(prefix='sparta-worker-')
+        proc = None
+        try:
+            folder = str(job['folder'])
+            command = str(job['command']).replace(folder, workdir)
+            outputfile = str(job.get('outputfile', ''))
+            if outputfile.startswith(folder):
+                os.makedirs(os.path.dirname(outputfile.replace(folder, workdir)), exist_ok=True)
+
+            print('[+] Running job for ' + str(job.get('target', '')) + ': ' + command)
+            try:
+                # same as SPARTA: no shell, and a session of its own so that everything it starts can be killed at once
+                proc = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, start_new_session=True)
+            except (OSError, ValueError) as e:
+                sendMessage(conn, {'type': 'output', 'data': 'Could not run the command: ' + str(e) + '\n'})
+                sendMessage(conn, {'type': 'finished', 'exitcode': 127})
+                return
+
+            threading.Thread(target=self.watchConnection, args=(f, proc), daemon=True).start()
+            for chunk in iter(lambda: os.read(proc.stdout.fileno(), 65536), b''):
+                sendMessage(conn, {'type': 'output', 'data': chunk.decode('ISO-8859-1')})
+            exitcode = proc.wait()
+            if exitcode < 0:                        # killed by a signal
+                exitcode = 128 - exitcode
+
+            for root, dirs, files in os.walk(workdir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as output:
+                        data = base64.b64encode(output.read()).decode('ascii')
+                    sendMessage(conn, {'type': 'file', 'path': os.path.relpath(path, workdir), 'data': data})
+            sendMessage(conn, {'type': 'finished', 'exitcode': exitcode})
+            print('[+] Job finished (' + str(exitcode) + '): ' + command)
+
+        except OSError:
+            # the relay is gone (eg: SPARTA was closed) so nobody wants the output anymore
+            if proc:
+                self.killJob(proc)
+            raise
+        finally:
+            if proc:
+                proc.stdout.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    # kills the job when asked to or when the connection is closed before the job is done
+    def watchConnection(self, f, proc):
+        try:
+            while proc.poll() is None:
+                message = readMessage(f)
+                if message is None or message.get('type') == 'kill':
+                    self.killJob(proc)
+                    return
+        except OSError:
+            self.killJob(proc)
+
+    # the tool gets a few seconds to exit before it is killed
+    def killJob(self, proc, grace=5):
+        if not proc.poll() is None:
+            return
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except OSError:
+            return
+        timer = threading.Timer(grace, self.signalJob, args=(proc, signal.SIGKILL))
+        timer.daemon = True
+        timer.start()
+
+    def signalJob(self, proc, sig):
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            pass                                    # the whole group is gone
+
+
+class WorkerRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.agent.handle(self.request)
+
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, agent):
+        host, port = splitAddress(address)
+        if ':' in host:
+            self.address_family = socket.AF_INET6
+        socketserver.ThreadingTCPServer.__init__(self, (host, port), WorkerRequestHandler)
+        self.agent = agent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='SPARTA remote worker')
+    modes = parser.add_subparsers(dest='mode')
+    serve = modes.add_parser('serve', help='Run the jobs sent by SPARTA')
+    serve.add_argument('-l', '--listen', default='127.0.0.1:7007', help='Address to listen on (host:port)')
+    serve.add_argument('-s', '--slots', type=int, default=4, help='Maximum number of jobs running at the same time')
+    serve.add_argument('-t', '--token', help='Token shared with SPARTA (defaults to the SPARTA_WORKER_TOKEN environment variable)')
+    relay = modes.add_parser('relay', help='Used by SPARTA to run a job on a worker')
+    relay.add_argument('address')
+    relay.add_argument('job')
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        token = args.token or os.environ.get('SPARTA_WORKER_TOKEN', '')
+        if not token:
+            token = secrets.token_hex(16)
+            print('[+] No token was given. Use this one in sparta.conf (remote-worker-token): ' + token)
+        server = WorkerServer(args.listen, WorkerAgent(token, args.slots))
+        print('[+] Waiting for jobs on ' + args.listen + ' (' + str(args.slots) + ' slots)')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+    elif args.mode == 'relay':
+        job = json.loads(base64.b64decode(args.job).decode('utf-8'))
+        sys.exit(relayJob(args.address, job, os.environ.get('SPARTA_WORKER_TOKEN', '')))
+
+    else:
+        parser.print_help()
@@ -18,12 +18,19 @@ import ntpath
 import signal
 import re
 import subprocess
-import queue
+import time
 from PyQt5.QtWidgets import QMenu, QApplication
-from PyQt5.QtCore import QProcess, QTimer, QVariant, Qt
+from PyQt5.QtCore import QProcess, QProcessEnvironment, QVariant, Qt, QTimer
 from app.logic import NmapImporter
-from app.auxiliary import MyQProcess, Screenshooter, BrowserOpener, getTimestamp
+from app.auxiliary import MyQProcess, Screenshooter, BrowserOpener, getTimestamp, isProcessAlive, isProcessGroupLeader, signalProcessGroup
 from app.settings import Settings, AppSettings
+from app.refresh import RefreshScheduler
+from app.output import OutputSink
+from app.thumbnails import ThumbnailGenerator
+from app.processqueue import ProcessClassifier, ProcessQueue, defaultPriorities
+from app.governor import ConcurrencyGovernor, readSystemSample
+from app.accounting import ProcessUsage, readAllProcStats, getProcessTree
+from app.worker import WorkerPool, unavailableExitCode
 
 
 class Controller():
@@ -39,7 +46,10 @@ class Controller():
         self.loadSettings()
         self.initNmapImporter()
         self.initScreenshooter()
+        self.initThumbnailGenerator()
         self.initBrowserOpener()
+        self.initGovernor()
+        self.initWorkers()
         # initialisations (globals, etc)
         self.start()
         self.initTimers()
@@ -48,12 +58,14 @@ class Controller():
     def start(self, title='*untitled'):
         # to store all the processes we run (nmaps, niktos, etc)
         self.processes = []
-        # to manage fast processes (banner, snmpenum, etc)
-        self.fastProcessQueue = queue.Queue()
-        # counts the number of fast processes currently running
-        self.fastProcessesRunning = 0
-        # counts the number of slow processes currently running
-        self.slowProcessesRunning = 0
+        # to manage fast processes (banner, snmpenum, etc) and slow processes (full nmaps, nikto, etc) in separate pools
+        self.processQueue = ProcessQueue(self.getProcessLimits())
+        self.applyProcessLimits()
+        # tools that are not classified in the settings are classified by how long they took to run in this project
+        self.processClassifier = ProcessClassifier(
+            self.settings.processClasses, self.settings.general_slow_process_threshold)
+        self.processClassifier.setRuntimes(
+            self.logic.getProcessRuntimesFromDB())
         # tell nmap importer which db to use
         self.nmapImporter.setDB(self.logic.db)
         # tell screenshooter where the output folder is
@@ -75,20 +87,72 @@ class Controller():
             self.settings.general_screenshooter_timeout)
         self.screenshooter.done.connect(self.screenshotFinished)
 
+    def initThumbnailGenerator(self):
+        # the thumbnails of new screenshots are created by a pool of worker threads before their tab is shown
+        self.thumbnailGenerator = ThumbnailGenerator()
+        self.thumbnailGenerator.done.connect(self.thumbnailFinished)
+        # screenshot filename -> [ip, port, dbId]
+        self.pendingScreenshots = dict()
+
     def initBrowserOpener(self):
         # browser opener object (different thread)
         self.browser = BrowserOpener()
 
-    # these timers are used to prevent from updating the UI several times within a short time period - which freezes the UI
+    # the governor adapts the number of processes running at the same time to the load of the machine (if enabled in the settings)
+    def initGovernor(self):
+        self.governor = ConcurrencyGovernor(self.settings.general_adaptive_min_processes, self.settings.general_adaptive_max_processes,
+                                            self.settings.general_adaptive_max_load, self.settings.general_adaptive_min_free_memory,
+                                            self.settings.general_max_fast_processes)
+        self.governorTimer = QTimer()
+        self.governorTimer.setInterval(5000)
+        self.governorTimer.timeout.connect(self.updateConcurrency)
+        self.updateGovernorTimer()
+
+    def updateGovernorTimer(self):
+        if self.isAdaptiveScheduling():
+            self.governorTimer.start()
+        else:
+            self.governorTimer.stop()
+
+    def updateConcurrency(self):
+        slots = self.governor.slots
+        if self.governor.update(readSystemSample(), self.processQueue.runningCount(), self.processQueue.queuedCount()) != slots:
+            print('[+] Adaptive scheduling: up to ' +
+                  str(self.governor.slots) + ' processes can run at the same time.')
+            self.processQueue.setLimits(self.getProcessLimits(), self.workerPool.capacity())
+            self.processQueue.setTotalLimit(self.governor.slots)
+            self.checkProcessQueue()
+
+    # processes can also run on remote workers when the local pools are full (see app/worker.py)
+    def initWorkers(self):
+        self.workerPool = WorkerPool(self.settings.remoteWorkers, self.settings.general_remote_worker_token)
+
+    # the refresh scheduler prevents from updating the UI several times within a short time period - which freezes the UI
+    # instead of refreshing everything, mark the regions that changed as dirty and they will be refreshed (at most once per second)
     def initTimers(self):
-        self.updateUITimer = QTimer()
-        self.updateUITimer.setSingleShot(True)
-        self.updateUITimer.timeout.connect(self.view.updateProcessesTableView)
-        self.updateUITimer.timeout.connect(self.view.updateToolsTableView)
-
-        self.updateUI2Timer = QTimer()
-        self.updateUI2Timer.setSingleShot(True)
-        self.updateUI2Timer.timeout.connect(self.view.updateInterface)
+        self.refreshScheduler = RefreshScheduler(1000)
+        # don't disrupt the user while a context menu is showing
+        self.refreshScheduler.setBusyCheck(lambda: self.view.menuVisible)
+        self.refreshScheduler.addHandler(
+            'interface', lambda hosts: self.view.updateInterface())
+        self.refreshScheduler.addHandler(
+            'processes', lambda hosts: self.view.updateProcessesTableView())
+        self.refreshScheduler.addHandler(
+            'tools', lambda hosts: self.view.updateToolsTableView())
+        self.refreshScheduler.addHandler(
+            'host', self.view.updateRightPanelForHosts)
+        # wakes up the process queue when it is waiting for the rate limit
+        self.processQueueTimer = QTimer()
+        self.processQueueTimer.setSingleShot(True)
+        self.processQueueTimer.timeout.connect(self.checkProcessQueue)
+        # samples the resources used by the running processes
+        self.usageTimer = QTimer()
+        self.usageTimer.setInterval(2000)
+        self.usageTimer.timeout.connect(self.sampleProcessUsage)
+        self.usageTimer.start()
+
+    def markDirty(self, region, host=None):
+        self.refreshScheduler.markDirty(region, host)
 
     # this function fetches all the settings from the conf file. Among other things it populates the actions lists that will be used in the context menus.
     def loadSettings(self):
@@ -105,6 +169,15 @@ class Controller():
     def applySettings(self, newSettings):
         print('[+] Applying settings!')
         self.settings = newSettings
+        self.processClassifier.setClasses(
+            self.settings.processClasses, self.settings.general_slow_process_threshold)
+        self.governor.setBounds(self.settings.general_adaptive_min_processes, self.settings.general_adaptive_max_processes,
+                                self.settings.general_adaptive_max_load, self.settings.general_adaptive_min_free_memory)
+        self.updateGovernorTimer()
+        self.workerPool.setWorkers(self.settings.remoteWorkers, self.settings.general_remote_worker_token)
+        self.applyProcessLimits()
+        # there may be room for more processes now
+        self.checkProcessQueue()
 
 #    def cancelSettings(self):                                           # called when the user presses cancel in the Settings dialog
 #        self.view.settingsWidget.setSettings(self.settings)             # resets the dialog's settings to the current application settings to forget any changes made by the user
@@ -119,6 +192,26 @@ class Controller():
     def getSettings(self):
         return self.settings
 
+    def isAdaptiveScheduling(self):
+        return self.settings.general_adaptive_processes == 'True'
+
+    # in adaptive mode the governor decides how many processes can run, slow processes are still capped by their own setting
+    def getProcessLimits(self):
+        if self.isAdaptiveScheduling():
+            slots = self.governor.slots
+            return {'fast': slots, 'slow': min(int(self.settings.general_max_slow_processes), slots)}
+        return {'fast': self.settings.general_max_fast_processes, 'slow': self.settings.general_max_slow_processes}
+
+    def applyProcessLimits(self):
+        self.processQueue.setLimits(self.getProcessLimits(), self.workerPool.capacity())
+        if self.isAdaptiveScheduling():
+            self.processQueue.setTotalLimit(self.governor.slots)
+        else:
+            self.processQueue.setTotalLimit(0)
+        # limits that protect the targets: processes per host, per /24 and per tool, and processes started per second
+        self.processQueue.setTargetLimits(self.settings.general_max_processes_per_host, self.settings.general_max_processes_per_subnet,
+                                          self.settings.general_max_processes_per_tool, self.settings.general_max_process_starts_per_second)
+
     #################### AUXILIARY ####################
 
     def getCWD(self):
@@ -136,6 +229,9 @@ class Controller():
     def getOutputFolder(self):
         return self.logic.outputfolder
 
+    def getProcessOutputLog(self, filename):
+        return self.logic.getProcessOutputLog(filename)
+
     def getUserlistPath(self):
         return self.logic.usernamesWordlist.filename
 
@@ -187,10 +283,68 @@ class Controller():
         self.start(ntpath.basename(str(self.logic.projectname)))
         # restores the tool tabs for each host
         self.view.restoreToolTabs()
-        # click on first host to restore his host tool tabs
-        self.view.hostTableClick()
         # hide the progress widget
         self.view.importProgressWidget.hide()
+        # offer to run the processes that didn't get to run (or to finish) last time
+        self.resumeInterruptedProcesses()
+        # click on first host to restore his host tool tabs
+        self.view.hostTableClick()
+
+    def resumeInterruptedProcesses(self):
+        resumable = []
+        stale = []
+        for p in self.logic.getInterruptedProcessesFromDB():
+            # processes that are still running can't be reattached (eg: the tool outlived SPARTA)
+            if p['status'] == 'Running' and isProcessAlive(p['pid']):
+                continue
+            # brute force tabs can't be restored
+            if p['name'] == 'hydra':
+                stale.append(p)
+            else:
+                resumable.append(p)
+
+        if resumable:
+            waiting = len([p for p in resumable if p['status'] == 'Waiting'])
+            if self.view.resumeProcessesConfirmation(waiting, len(resumable) - waiting):
+                for p in resumable:
+                    self.resumeProcess(p)
+            else:
+                stale.extend(resumable)
+
+        # so that they don't stay 'Waiting' or 'Running' forever
+        for p in stale:
+            if p['status'] == 'Waiting':
+                self.logic.storeProcessCancelStatusInDB(str(p['id']))
+            else:
+                self.logic.storeProcessCrashStatusInDB(str(p['id']))
+        self.markDirty('processes')
+
+    def resumeProcess(self, p):
+        command = str(p['command'])
+        outputfile = str(p['outputfile'])
+        # the running folder of the previous session is gone so the tool output goes to the current one
+        oldfolder = os.path.dirname(os.path.dirname(outputfile))
+        if oldfolder.endswith('-running') and not oldfolder == self.logic.runningfolder:
+            command = command.replace(oldfolder, self.logic.runningfolder)
+            outputfile = outputfile.replace(oldfolder, self.logic.runningfolder)
+
+        # staged nmaps carry on with the next stages
+        stage = 0
+        discovery = True
+        match = re.match(r'nmap \(stage (\d)\)', str(p['tabtitle']))
+        if p['name'] == 'nmap' and match:
+            stage = int(match.group(1))
+            discovery = not ' -Pn ' in command
+
+        priority = p['priority']
+        if priority is None:
+            priority = defaultPriorities['scheduler']
+
+        self.view.removePendingToolTab(p['hostip'], p['id'])
+        textbox = self.view.createNewTabForHost(
+            str(p['hostip']), str(p['tabtitle']), True)
+        self.runCommand(str(p['name']), str(p['tabtitle']), str(p['hostip']), str(p['port']), str(p['protocol']), command, getTimestamp(
+            True), outputfile, textbox, discovery, stage, False, priority, p['id'])
 
     def saveProject(self, lastHostIdClicked, notes):
         if not lastHostIdClicked == '':
@@ -208,6 +362,8 @@ class Controller():
         self.saveSettings()
         self.screenshooter.terminate()
         self.initScreenshooter()
+        self.pendingScreenshots = dict()
+        self.refreshScheduler.clear()
         self.logic.toggleProcessDisplayStatus(True)
         # clear process table
         self.view.updateProcessesTableView()
@@ -284,6 +440,7 @@ class Controller():
                 self.logic.deleteAllPortsAndScriptsForHostFromDB(hostid, 'tcp')
             if self.logic.getPortsForHostFromDB(ip, 'udp'):
                 self.logic.deleteAllPortsAndScriptsForHostFromDB(hostid, 'udp')
+            self.markDirty('host', ip)
             self.runStagedNmap(ip, False)
             return
 
@@ -311,10 +468,12 @@ class Controller():
                     if self.logic.getPortsForHostFromDB(ip, proto):
                         self.logic.deleteAllPortsAndScriptsForHostFromDB(
                             hostid, proto)
+                        self.markDirty('host', ip)
 
                 tabtitle = self.settings.hostActions[i][1]
+                # the action (not the tool name) is what the ProcessClasses and ProcessTimeouts settings refer to
                 self.runCommand(name, tabtitle, ip, '', '', command, getTimestamp(
-                    True), outputfile, self.view.createNewTabForHost(ip, tabtitle, invisibleTab))
+                    True), outputfile, self.view.createNewTabForHost(ip, tabtitle, invisibleTab), action=self.settings.hostActions[i][1])
                 break
 
     def getContextMenuForServiceName(self, serviceName='*', menu=None):
@@ -446,6 +605,12 @@ class Controller():
         # clearAction = menu.addAction("Clear")
         menu.addAction("Kill")
         menu.addAction("Clear")
+        # these only apply to processes that are still waiting
+        menu.addSeparator()
+        menu.addAction("Move to top")
+        menu.addAction("Increase priority")
+        menu.addAction("Decrease priority")
+        menu.addAction("Move to bottom")
         return menu
 
     # selectedProcesses is a list of tuples (pid, status, procId)
@@ -473,6 +638,25 @@ class Controller():
         if action.text() == 'Clear':
             self.logic.toggleProcessDisplayStatus()
             self.view.updateProcessesTableView()
+            return
+
+        if action.text() in ['Move to top', 'Increase priority', 'Decrease priority', 'Move to bottom']:
+            lowest, highest = self.processQueue.getPriorityRange()
+            for p in selectedProcesses:
+                proc = self.processQueue.find(p[2])
+                if proc is None:
+                    continue
+                if action.text() == 'Move to top':
+                    priority = highest + 1
+                elif action.text() == 'Increase priority':
+                    priority = proc.priority + 10
+                elif action.text() == 'Decrease priority':
+                    priority = proc.priority - 10
+                else:
+                    priority = lowest - 1
+                self.processQueue.setPriority(proc, priority)
+                self.logic.storeProcessPriorityInDB(proc.id, priority)
+            self.markDirty('processes')
 
     #################### LEFT PANEL INTERFACE UPDATE FUNCTIONS ####################
 
@@ -502,8 +686,14 @@ class Controller():
     def getPortsAndServicesForHostFromDB(self, hostIP, filters):
         return self.logic.getPortsAndServicesForHostFromDB(hostIP, filters)
 
-    def getHostsAndPortsForServiceFromDB(self, serviceName, filters):
-        return self.logic.getHostsAndPortsForServiceFromDB(serviceName, filters)
+    def getHostsAndPortsForServiceFromDB(self, serviceName, filters, after=None, limit=None, descending=False, orderBy='host'):
+        return self.logic.getHostsAndPortsForServiceFromDB(serviceName, filters, after, limit, descending, orderBy)
+
+    def countHostsAndPortsForServiceFromDB(self, serviceName, filters):
+        return self.logic.countHostsAndPortsForServiceFromDB(serviceName, filters)
+
+    def getTargetsForServiceFromDB(self, serviceName, filters, tool=None):
+        return self.logic.getTargetsForServiceFromDB(serviceName, filters, tool)
 
     def getHostInformation(self, hostIP):
         return self.logic.getHostInformation(hostIP)
@@ -517,6 +707,18 @@ class Controller():
     def getScriptOutputFromDB(self, scriptDBId):
         return self.logic.getScriptOutputFromDB(scriptDBId)
 
+    def getSubnetsFromDB(self, filters, prefix=16, parent=None):
+        return self.logic.getSubnetsFromDB(filters, prefix, parent)
+
+    def getHostsForSubnetFromDB(self, filters, subnet):
+        return self.logic.getHostsForSubnetFromDB(filters, subnet)
+
+    def getHostDetails(self, hostId):
+        return self.logic.getHostDetails(hostId)
+
+    def isHostDetailsCached(self, hostId):
+        return self.logic.isHostDetailsCached(hostId)
+
     def getNoteFromDB(self, hostid):
         return self.logic.getNoteFromDB(hostid)
 
@@ -528,68 +730,272 @@ class Controller():
     def getProcessesFromDB(self, filters, showProcesses=''):
         return self.logic.getProcessesFromDB(filters, showProcesses)
 
+    def getThumbnailGenerator(self):
+        return self.thumbnailGenerator
+
+    def getScreenshotsFromDB(self):
+        return self.logic.getScreenshotsFromDB()
+
+    def getProcessOutputFromDB(self, procId):
+        return self.logic.getProcessOutputFromDB(procId)
+
     #################### PROCESSES ####################
 
     def checkProcessQueue(self):
-        #       print('# MAX PROCESSES: ' + str(self.settings.general_max_fast_processes))
-        #       print('# fast processes running: ' + str(self.fastProcessesRunning))
-        #       print('# fast processes queued: ' + str(self.fastProcessQueue.qsize()))
-        #       print("[+] Checking process queue..")
-        if not self.fastProcessQueue.empty():
-            if (self.fastProcessesRunning < int(self.settings.general_max_fast_processes)):
-                next_proc = self.fastProcessQueue.get()
-                # print(str(next_proc.command))
-                if not self.logic.isCanceledProcess(str(next_proc.id)):
-                    next_proc.display.clear()
-                    self.processes.append(next_proc)
-                    self.fastProcessesRunning += 1
-                    next_proc.start(next_proc.command)
-                    self.logic.storeProcessRunningStatusInDB(
-                        next_proc.id, next_proc.pid())
-                elif not self.fastProcessQueue.empty():
-                    self.checkProcessQueue()
-#           else:
-#               print('> cannot run processes in the queue')
-#       else:
-#           print('> queue is empty')
+        # start as many processes as the pools allow (processes that were cancelled while waiting are skipped)
+        # processes run on this machine if there is room, otherwise on the remote worker with the most free slots
+        full = set()
+        localOnly = []
+        next_proc = self.processQueue.next()
+        while next_proc:
+            if not self.logic.isCanceledProcess(str(next_proc.id)):
+                next_proc.remote = not self.processQueue.hasLocalSlot(next_proc.processClass)
+                if next_proc.remote and (not self.workerPool.hasFreeSlot() or not self.canRunRemotely(next_proc)):
+                    if self.workerPool.hasFreeSlot():
+                        # it waits for a local slot but the processes behind it can still go to the workers
+                        localOnly.append(next_proc)
+                    else:
+                        # this pool is full until a process finishes
+                        full.add(next_proc.processClass)
+                        self.processQueue.insert(next_proc)
+                    next_proc = self.processQueue.next(full)
+                    continue
+                if next_proc.remote:
+                    next_proc.worker = self.workerPool.acquire()
+
+                next_proc.display.clear()
+                # chatty tools can produce thousands of chunks per second so the output is buffered and the display is bounded
+                # the log is opened when the process starts so that waiting processes don't hold a file descriptor
+                next_proc.sink = OutputSink(next_proc.display, self.logic.getProcessOutputLogFilename(
+                    next_proc.id), self.settings.general_tool_output_max_lines)
+                self.processes.append(next_proc)
+                self.processQueue.started(next_proc)
+                next_proc.startedAt = time.time()
+                next_proc.requeued = False
+                if next_proc.remote:
+                    self.startRemotely(next_proc)
+                else:
+                    next_proc.setProcessChannelMode(QProcess.MergedChannels)
+                    next_proc.startInSession()
+                self.logic.storeProcessRunningStatusInDB(
+                    next_proc.id, next_proc.pid())
+                next_proc.usage = ProcessUsage(next_proc.pid())
+                # short-lived processes would otherwise finish before the first sample of the timer
+                next_proc.usage.sample()
+                self.startWatchdog(next_proc)
+            next_proc = self.processQueue.next(full)
+
+        for proc in localOnly:
+            self.processQueue.insert(proc)
+
+        # if the queue is held by the rate limit, try again when the budget allows it
+        wait = self.processQueue.waitTime()
+        if wait > 0 and not self.processQueueTimer.isActive():
+            self.processQueueTimer.start(int(wait * 1000) + 1)
+
+    # commands that use files from the output folder (eg: the wordlists) can't run on a remote worker
+    def canRunRemotely(self, proc):
+        return not self.logic.outputfolder in proc.command
+
+    # the process is a relay that sends the command to the worker and gives us its output and its exit code
+    def startRemotely(self, proc):
+        print('[+] Running on the remote worker ' + proc.worker.getAddress() + ': ' + proc.command)
+        environment = QProcessEnvironment.systemEnvironment()
+        environment.insert('SPARTA_WORKER_TOKEN', self.workerPool.token)
+        proc.setProcessEnvironment(environment)
+        # the output of the tool comes through stdout, the relay only writes to stderr when the worker can't take the job
+        proc.setProcessChannelMode(QProcess.SeparateChannels)
+        proc.startInSession(self.workerPool.getRelayCommand(proc.worker, proc, self.logic.runningfolder))
+
+    # frees the slot of the remote worker (can be called more than once for the same process)
+    def releaseWorker(self, proc):
+        worker = getattr(proc, 'worker', None)
+        if not worker:
+            return
+        proc.worker = None
+        self.workerPool.release(worker)
+
+    # true if the relay exited because the worker couldn't take the job (see app/worker.py)
+    def isWorkerUnavailable(self, proc):
+        if not getattr(proc, 'remote', False) or not proc.exitCode() == unavailableExitCode:
+            return False
+        reason = str(proc.readAllStandardError().data().decode('ISO-8859-1')).strip()
+        if not reason:
+            return False
+        print(reason)
+        return True
+
+    # the job never ran so it goes back in the queue and the worker is left alone for a while
+    def requeueProcess(self, proc):
+        if hasattr(proc, 'watchdog'):
+            proc.watchdog.stop()
+        self.workerPool.disable(proc.worker)
+        self.releaseWorker(proc)
+        # the log is opened again (and emptied) when the process starts
+        proc.sink.close()
+        # so that the next stage of a staged nmap waits for the real run (see runNextStage)
+        proc.requeued = True
+        self.processQueue.finished(proc)
+        if proc in self.processes:
+            self.processes.remove(proc)
+        proc.remote = False
+        self.logic.storeProcessResumeInDB(proc)
+        self.processQueue.insert(proc)
+        self.checkProcessQueue()
+        self.markDirty('processes')
+
+    # launches the next stage of a staged nmap when the process finishes
+    def runNextStage(self, proc, iprange, discovery, stage):
+        if getattr(proc, 'requeued', False):
+            return
+        self.runStagedNmap(iprange, discovery, stage, self.logic.isKilledProcess(str(proc.id)))
+
+    # every nmap host action runs as 'nmap' (so that they appear under the same tool) but the tab title is the action
+    def getProcessAction(self, name, tabtitle):
+        if name == 'nmap' and tabtitle:
+            return str(tabtitle)
+        return str(name)
+
+    # the maximum time (in seconds) the action can run for (0 means no limit)
+    def getProcessTimeout(self, name):
+        try:
+            return int(self.settings.processTimeouts.get(str(name), self.settings.general_process_timeout))
+        except ValueError:
+            return 0
+
+    def startWatchdog(self, qProcess):
+        timeout = self.getProcessTimeout(qProcess.action)
+        if timeout <= 0:
+            return
+        qProcess.watchdog = QTimer()
+        qProcess.watchdog.setSingleShot(True)
+        qProcess.watchdog.timeout.connect(lambda: self.processTimedOut(qProcess))
+        qProcess.watchdog.start(timeout * 1000)
+
+    def processTimedOut(self, qProcess):
+        if not qProcess in self.processes:
+            return
+        print('[+] Process timed out: ' + str(qProcess.pid()))
+        self.logic.storeProcessTimeoutStatusInDB(str(qProcess.id))
+        try:
+            self.terminateProcessTree(qProcess.pid())
+        except OSError:
+            pass
+        # free the slot now, the process may take a while to exit
+        self.processQueue.finished(qProcess)
+        self.checkProcessQueue()
+        self.markDirty('processes')
+        self.markDirty('tools')
+
+    def sampleProcessUsage(self):
+        if not self.processes:
+            return
+        stats = readAllProcStats()
+        for p in self.processes:
+            if hasattr(p, 'usage'):
+                p.usage.sample(stats)
+
+    def getToolStatsFromDB(self):
+        return self.logic.getToolStatsFromDB()
 
     def cancelProcess(self, dbId):
         print('[+] Canceling process: ' + str(dbId))
         self.logic.storeProcessCancelStatusInDB(
             str(dbId))              # mark it as cancelled
-        self.updateUITimer.stop()
         # update the interface soon
-        self.updateUITimer.start(1500)
+        self.markDirty('processes')
+        self.markDirty('tools')
 
     def killProcess(self, pid, dbId):
         print('[+] Killing process: ' + str(pid))
         self.logic.storeProcessKillStatusInDB(
             str(dbId))                # mark it as killed
         try:
-            os.kill(int(pid), signal.SIGTERM)
+            self.terminateProcessTree(int(pid))
         except OSError:
             print('\t[-] This process has already been terminated.')
         except:
             print("\t[-] Unexpected error:", sys.exc_info()[0])
 
-    def killRunningProcesses(self):
+    # the command is often a wrapper (bash -c, scripts) so the tools it started must be terminated too. whatever is left
+    # of the process group after a few seconds is killed
+    def terminateProcessTree(self, pid, grace=5000):
+        pid = int(pid)
+        # the process never started (or its pid was not stored): 0 would signal our own process group
+        if pid <= 0:
+            return
+        if isProcessGroupLeader(pid) or pid in [p.groupId for p in self.processes if p.groupId]:
+            os.killpg(pid, signal.SIGTERM)
+            QTimer.singleShot(
+                grace, lambda: signalProcessGroup(pid, signal.SIGKILL))
+            return
+
+        # the process doesn't have its own group (eg: setsid is not available) so we signal the descendants we can find
+        # (they must be found before the parent dies, otherwise they are adopted by init)
+        tree = getProcessTree(pid, readAllProcStats())
+        os.kill(pid, signal.SIGTERM)
+        for p in reversed(tree):
+            try:
+                os.kill(p, signal.SIGTERM)
+            except OSError:
+                pass
+
+    # true when nothing is running or waiting to run (no processes, nmap imports or screenshots)
+    def isIdle(self):
+        # a process that is not running anymore can't be waited for (eg: it failed to start)
+        if not self.processQueue.empty() or [p for p in self.processes if not p.state() == QProcess.NotRunning]:
+            return False
+        return not (self.nmapImporter.isRunning() or self.screenshooter.isRunning() or self.screenshooter.urls)
+
+    # called on exit, so we can't wait for the timers: the groups that are still alive after a second are killed
+    # resumable: the processes are not marked as killed so that they are resumed the next time the project is opened
+    def killRunningProcesses(self, resumable=False):
         print('[+] Killing running processes!')
+        groups = [p.groupId for p in self.processes if p.groupId]
         for p in self.processes:
             p.finished.disconnect()                 # experimental
-            self.killProcess(int(p.pid()), p.id)
+            if resumable:
+                try:
+                    self.terminateProcessTree(int(p.pid()))
+                except OSError:
+                    pass
+            else:
+                self.killProcess(int(p.pid()), p.id)
+
+        deadline = time.time() + 1
+        while groups and time.time() < deadline:
+            groups = [g for g in groups if signalProcessGroup(g, 0)]
+            time.sleep(0.1)
+        for g in groups:
+            signalProcessGroup(g, signal.SIGKILL)
 
     # this function creates a new process, runs the command and takes care of displaying the ouput. returns the PID
     # the last 3 parameters are only used when the command is a staged nmap
-    def runCommand(self, name, tabtitle, hostip, port, protocol, command, starttime, outputfile, textbox, discovery=True, stage=0, stop=False):
+    # processes run in order of priority, by default the ones launched by the user go first (see processqueue.py)
+    # dbId is only given when a process from a previous session runs again (see resumeProcess)
+    # action is the key of the action in the settings (see getProcessAction)
+    def runCommand(self, name, tabtitle, hostip, port, protocol, command, starttime, outputfile, textbox, discovery=True, stage=0, stop=False, priority=None, dbId=None, action=None):
         print("[DEBUG] Running: " + command)
         # create folder for tool if necessary
         self.logic.createFolderForTool(name)
         qProcess = MyQProcess(name, tabtitle, hostip, port,
                               protocol, command, starttime, outputfile, textbox)
+        if priority is None:
+            priority = defaultPriorities['manual']
+        qProcess.priority = int(priority)
+        qProcess.action = action or self.getProcessAction(name, tabtitle)
+        if dbId is None:
+            dbId = self.logic.addProcessToDB(qProcess)
+        else:
+            qProcess.id = int(dbId)
+            self.logic.storeProcessResumeInDB(qProcess)
         # database id for the process is stored so that we can retrieve the widget later (in the tools tab)
-        textbox.setProperty('dbId', QVariant(
-            str(self.logic.addProcessToDB(qProcess))))
-        self.fastProcessQueue.put(qProcess)
+        textbox.setProperty('dbId', QVariant(str(dbId)))
+        # the last nmap stages scan thousands of ports so they always go to the slow pool
+        if name == 'nmap' and stage > 3:
+            self.processQueue.put(qProcess, 'slow')
+        else:
+            self.processQueue.put(qProcess, self.processClassifier.classify(qProcess.action))
         qProcess.display.appendPlainText(
             'The process is queued and will start as soon as possible.')
         qProcess.display.appendPlainText(
@@ -597,11 +1003,10 @@ class Controller():
         self.checkProcessQueue()
 
         # update the processes table
-        self.updateUITimer.stop()
-        self.updateUITimer.start(900)
+        self.markDirty('processes')
+        self.markDirty('tools')
         # while the process is running, when there's output to read, display it in the GUI
-        qProcess.setProcessChannelMode(QProcess.MergedChannels)
-        qProcess.readyReadStandardOutput.connect(lambda: qProcess.display.appendPlainText(
+        qProcess.readyReadStandardOutput.connect(lambda: qProcess.sink.write(
             str(qProcess.readAllStandardOutput().data().decode('ISO-8859-1'))))
         # when the process is finished do this
         qProcess.sigHydra.connect(self.handleHydraFindings)
@@ -610,8 +1015,8 @@ class Controller():
 
         # if this is a staged nmap, launch the next stage
         if stage > 0 and stage < 5:
-            qProcess.finished.connect(lambda: self.runStagedNmap(
-                str(hostip), discovery, stage+1, self.logic.isKilledProcess(str(qProcess.id))))
+            qProcess.finished.connect(lambda: self.runNextStage(
+                qProcess, str(hostip), discovery, stage+1))
 
         # return the pid so that we can kill the process if needed
         return qProcess.pid()
@@ -653,12 +1058,21 @@ class Controller():
                 command += "-sT "
             command += "-p "+ports+' '+iprange+" -oA "+outputfile
 
+            # the first stages give quick results, the last ones are full port scans
+            if stage < 3:
+                priority = defaultPriorities['staged']
+            elif stage == 3:
+                priority = defaultPriorities['scheduler']
+            else:
+                priority = defaultPriorities['fullscan']
+
             self.runCommand('nmap', 'nmap (stage '+str(stage)+')', str(iprange), '', '',
-                            command, getTimestamp(True), outputfile, textbox, discovery, stage, stop)
+                            command, getTimestamp(True), outputfile, textbox, discovery, stage, stop, priority)
 
     def nmapImportFinished(self):
-        self.updateUI2Timer.stop()
-        self.updateUI2Timer.start(800)
+        # the imported hosts/services need to be fetched from the DB again
+        self.logic.invalidateResultCaches()
+        self.markDirty('interface')
         # hide the progress widget
         self.view.importProgressWidget.hide()
         # if nmap import was the first action, we need to hide the overlay (note: we shouldn't need to do this everytime. this can be improved)
@@ -666,18 +1080,38 @@ class Controller():
 
     def screenshotFinished(self, ip, port, filename):
         dbId = self.logic.addScreenshotToDB(str(ip), str(port), str(filename))
+        screenshot = str(self.logic.outputfolder)+'/screenshots/'+str(filename)
+        self.pendingScreenshots.update({screenshot: [str(ip), str(port), str(dbId)]})
+        self.thumbnailGenerator.request(screenshot)
+
+    def thumbnailFinished(self, filename, thumbnail):
+        if not filename in self.pendingScreenshots:
+            return
+        ip, port, dbId = self.pendingScreenshots.pop(filename)
         imageviewer = self.view.createNewTabForHost(
-            ip, 'screenshot ('+port+'/tcp)', True, '', str(self.logic.outputfolder)+'/screenshots/'+str(filename))
-        imageviewer.setProperty('dbId', QVariant(str(dbId)))
+            ip, 'screenshot ('+port+'/tcp)', True, '', filename)
+        imageviewer.setProperty('dbId', QVariant(dbId))
         # to make sure the screenshot tab appears when it is launched from the host services tab
         self.view.switchTabClick()
         # update the processes table
-        self.updateUITimer.stop()
-        self.updateUITimer.start(900)
+        self.markDirty('processes')
+        self.markDirty('tools')
 
     def processCrashed(self, proc):
         # self.processFinished(proc, True)
         self.logic.storeProcessCrashStatusInDB(str(proc.id))
+        # processes that fail to start never finish so their slot must be freed here
+        if proc.state() == QProcess.NotRunning:
+            if hasattr(proc, 'watchdog'):
+                proc.watchdog.stop()
+            self.releaseWorker(proc)
+            proc.sink.close()
+            self.processQueue.finished(proc)
+            if proc in self.processes:
+                self.processes.remove(proc)
+            self.checkProcessQueue()
+            self.markDirty('processes')
+            self.markDirty('tools')
         print('[+] Process killed!')
 
     # this function handles everything after a process ends
@@ -685,6 +1119,19 @@ class Controller():
     def processFinished(self, qProcess):
         # print('processFinished!!')
         try:
+            if self.isWorkerUnavailable(qProcess):
+                self.requeueProcess(qProcess)
+                return
+            if hasattr(qProcess, 'watchdog'):
+                qProcess.watchdog.stop()
+            # processes the command left behind (eg: started in the background by a script) would hold resources forever
+            signalProcessGroup(qProcess.groupId, signal.SIGTERM)
+            self.releaseWorker(qProcess)
+            # the display only shows the last lines, the full output is in the log file
+            qProcess.sink.close()
+            qProcess.sink.setFilename(
+                self.logic.moveProcessOutputLog(qProcess.sink.filename))
+
             # if process was not killed
             if not self.logic.isKilledProcess(str(qProcess.id)):
                 if not qProcess.outputfile == '':
@@ -699,16 +1146,24 @@ class Controller():
                                 str(newoutputfile)+'.xml')
                             self.view.importProgressWidget.reset(
                                 'Importing nmap..')
+                            # the importer only needs to know that this xml comes from a process we ran
                             self.nmapImporter.setOutput(
-                                str(qProcess.display.toPlainText()))
+                                str(qProcess.sink.filename))
                             self.nmapImporter.start()
                             if self.view.menuVisible == False:
                                 self.view.importProgressWidget.show()
 
                 print("\t[+] The process is done!")
+                # only runs that completed tell us how long the tool takes
+                if hasattr(qProcess, 'startedAt') and self.logic.getProcessStatusForDBId(qProcess.id) == 'Running':
+                    self.processClassifier.addRuntime(
+                        qProcess.action, time.time() - qProcess.startedAt)
 
-            self.logic.storeProcessOutputInDB(
-                str(qProcess.id), qProcess.display.toPlainText())
+            self.logic.storeProcessOutputInDB(str(
+                qProcess.id), qProcess.sink.filename, qProcess.sink.size, qProcess.sink.checksum())
+            if hasattr(qProcess, 'usage'):
+                self.logic.storeProcessUsageInDB(str(qProcess.id), qProcess.usage.getPeakRss(), qProcess.usage.getCpuTime(
+                ), time.time() - qProcess.startedAt, qProcess.sink.size)
 
             # find the corresponding widget and tell it to update its UI
             if 'hydra' in qProcess.name:
@@ -716,12 +1171,12 @@ class Controller():
                     str(self.logic.getPidForProcess(str(qProcess.id))))
 
             try:
-                self.fastProcessesRunning -= 1
+                self.processQueue.finished(qProcess)
                 self.checkProcessQueue()
                 self.processes.remove(qProcess)
-                self.updateUITimer.stop()
                 # update the interface soon
-                self.updateUITimer.start(1500)
+                self.markDirty('processes')
+                self.markDirty('tools')
 
             except ValueError:
                 pass
@@ -784,8 +1239,7 @@ class Controller():
                             # if 'nmap' in tabtitle:                          # we don't want to show nmap tabs
                             #    restoring = True
 
-                            tab = self.view.ui.HostsTabWidget.tabText(
-                                self.view.ui.HostsTabWidget.currentIndex())
+                            tab = self.view.getCurrentHostsTab()
                             self.runCommand(tool[0], tabtitle, ip, port, protocol, command, getTimestamp(
-                                True), outputfile, self.view.createNewTabForHost(ip, tabtitle, not (tab == 'Hosts')))
+                                True), outputfile, self.view.createNewTabForHost(ip, tabtitle, not (tab == 'Hosts')), priority=defaultPriorities['scheduler'])
                             break
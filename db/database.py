@@ -56,9 +56,20 @@ class Database:
         self.session.configure(bind=self.engine, autoflush=False)
         self.metadata = Base.metadata
         self.metadata.create_all(self.engine)
+        self.addMissingColumns()
         self.metadata.echo = True
         self.metadata.bind = self.engine
 
+    # create_all() does not touch existing tables, so projects created by older versions need the columns added since then
+    def addMissingColumns(self):
+        for table in self.metadata.sorted_tables:
+            existing = [str(c[1]) for c in self.engine.execute(
+                'PRAGMA table_info(' + table.name + ')').fetchall()]
+            for column in table.columns:
+                if not column.name in existing:
+                    self.engine.execute('ALTER TABLE ' + table.name + ' ADD COLUMN ' +
+                                        column.name + ' ' + column.type.compile(dialect=self.engine.dialect))
+
     # this function commits any modified data to the db, ensuring no concurrent write access to the DB (within the same thread)
     # if you code a thread that writes to the DB, make sure you acquire/release at the beginning/end of the thread (see nmap importer)
 
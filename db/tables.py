@@ -11,7 +11,7 @@ Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
     You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-from sqlalchemy import Column, String, Unicode, Integer, ForeignKey
+from sqlalchemy import Column, String, Unicode, Integer, Float, ForeignKey
 from sqlalchemy.orm import relationship
 from db.database import Base as Base
 
@@ -132,6 +132,8 @@ class nmap_host(Base):
     distance = Column(String)
     state = Column(String)
     count = Column(String)
+    # the ip as an integer (IPv4 only), used to group hosts by subnet and to sort/page by ip in SQL
+    ip_key = Column(Integer)
 
     # host relationships
     os = relationship(nmap_os)
@@ -159,6 +161,10 @@ class process_output(Base):
     __tablename__ = 'process_output'
     id = Column(Integer, primary_key=True)
     output = Column(String)
+    # the output itself is kept on disk, the DB only stores where to find it (relative to the output folder)
+    filename = Column(String)
+    size = Column(Integer)
+    checksum = Column(String)
     process_id = Column(Integer, ForeignKey('process.id'))
 
     def __init__(self):
@@ -184,6 +190,13 @@ class process(Base):
     output = relationship(process_output)
     status = Column(String)
     closed = Column(String)
+    # the higher, the sooner it runs (see processqueue.py)
+    priority = Column(Integer)
+    # resources used by the process and its descendants (see accounting.py): bytes, seconds, seconds, bytes
+    peak_rss = Column(Integer)
+    cpu_time = Column(Float)
+    wall_time = Column(Float)
+    output_bytes = Column(Integer)
 
     def __init__(self, pid, name, tabtitle, hostip, port, protocol, command, starttime, endtime, outputfile, status, processOutputId):
         self.display = 'True'
@@ -27,7 +27,9 @@ except ImportError as e:
     print(e)
     exit(1)
 
+import os
 import sys
+import signal
 import argparse
 from app.logic import Logic
 from ui.gui import Ui_MainWindow
@@ -84,8 +86,53 @@ if __name__ == "__main__":
         "-t", "--target", help="Automatically launch a staged nmap against the target IP range")
     parser.add_argument(
         "-f", "--file", help="Import nmap XML file and kick off automated attacks")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without the GUI (eg: on a server with no display) and exit when there is nothing left to do")
+    parser.add_argument(
+        "-o", "--output", help="Project file (.sprt) where the results are saved (headless mode)")
+    parser.add_argument(
+        "-p", "--project", help="Open an existing project and resume its processes (headless mode)")
     args = parser.parse_args()
 
+    if args.headless:
+        if not args.output and not args.project:
+            parser.error('the headless mode needs a project file to save the results to (-o or -p)')
+        if args.project and not os.path.isfile(args.project):
+            parser.error('the project file ' + args.project + ' does not exist')
+
+        from ui.headless import HeadlessView, HeadlessRunner
+
+        # no widgets are created so there is no need for a display
+        app = QtCore.QCoreApplication(sys.argv)
+        logic = Logic()
+        view = HeadlessView()
+        controller = Controller(view, logic)
+
+        if args.project:
+            controller.openExistingProject(args.project)
+        if args.output:
+            if not controller.saveProjectAs(args.output, 1):
+                print('[-] Could not save the project to ' + args.output)
+                controller.closeProject()
+                exit(1)
+            # the results are written to the project file as they arrive so they are not lost if something goes wrong
+            controller.updateOutputFolder()
+
+        if args.target:
+            print("[+] Target was specified.")
+            controller.addHosts(args.target, True, True)
+
+        if args.file:
+            print("[+] Nmap XML file was provided.")
+            controller.importNmap(args.file)
+
+        runner = HeadlessRunner(controller)
+        # ctrl+c (or a kill) saves the project before exiting
+        signal.signal(signal.SIGINT, lambda signum, frame: runner.stop(True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop(True))
+        runner.start()
+        sys.exit(app.exec_())
+
     app = QtWidgets.QApplication(sys.argv)
     myFilter = MyEventFilter()                        # to capture events
     app.installEventFilter(myFilter)
@@ -13,13 +13,17 @@ Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
 
 import os
 # from PyQt5 import QtCore, QtWidgets, QtGui
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QPalette, QImage, QPixmap, QMovie, QFont
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar, QWidget, QPlainTextEdit
 from PyQt5.QtWidgets import QSizePolicy, QScrollArea, QMessageBox, QLineEdit, QSpacerItem, QCheckBox
-from PyQt5.QtWidgets import QPushButton, QRadioButton, QComboBox, QGroupBox, QButtonGroup, QFileDialog
+from PyQt5.QtWidgets import QPushButton, QRadioButton, QComboBox, QGroupBox, QButtonGroup, QFileDialog, QStyledItemDelegate
+from PyQt5.QtWidgets import QListView, QAbstractItemView, QTableView
 
 from app.auxiliary import getTimestamp
+from app.output import MappedOutput, OutputIndexer
+from app.thumbnails import createThumbnail
+from app.outputmodels import OutputLinesModel
 
 # progress bar widget that displayed when long operations are taking place (eg: nmap, opening project)
 
@@ -63,6 +67,8 @@ class ImageViewer(QWidget):
         QWidget.__init__(self, parent)
 
         self.scaleFactor = 0.0
+        self.fileName = ''
+        self.fullImageLoaded = False
 
         self.imageLabel = QLabel()
         self.imageLabel.setBackgroundRole(QPalette.Base)
@@ -73,9 +79,17 @@ class ImageViewer(QWidget):
         self.scrollArea.setBackgroundRole(QPalette.Dark)
         self.scrollArea.setWidget(self.imageLabel)
 
+    # shows the thumbnail of the image (created if needed). the full image is only decoded when the user zooms
     def open(self, fileName):
+        self.fileName = fileName
+        self.fullImageLoaded = False
         if fileName:
-            image = QImage(fileName)
+            thumbnail = createThumbnail(fileName)
+            if thumbnail:
+                image = QImage(thumbnail)
+            else:
+                image = QImage(fileName)
+                self.fullImageLoaded = True
             if image.isNull():
                 QMessageBox.information(
                     self, "Image Viewer", "Cannot load %s." % fileName)
@@ -86,6 +100,15 @@ class ImageViewer(QWidget):
             # by default, fit to window/widget size
             self.fitToWindow()
 
+    def loadFullImage(self):
+        if self.fullImageLoaded or not self.fileName:
+            return
+        image = QImage(self.fileName)
+        if image.isNull():
+            return
+        self.fullImageLoaded = True
+        self.imageLabel.setPixmap(QPixmap.fromImage(image))
+
     def zoomIn(self):
         self.scaleImage(1.25)
 
@@ -93,6 +116,7 @@ class ImageViewer(QWidget):
         self.scaleImage(0.8)
 
     def normalSize(self):
+        self.loadFullImage()
         self.fitToWindow(False)
         self.imageLabel.adjustSize()
         self.scaleFactor = 1.0
@@ -101,6 +125,7 @@ class ImageViewer(QWidget):
         self.scrollArea.setWidgetResizable(fit)
 
     def scaleImage(self, factor):
+        self.loadFullImage()
         self.fitToWindow(False)
         self.scaleFactor *= factor
         self.imageLabel.resize(
@@ -113,25 +138,238 @@ class ImageViewer(QWidget):
         scrollBar.setValue(int(factor * scrollBar.value() +
                            ((factor - 1) * scrollBar.pageStep()/2)))
 
-# this class is used to display the process status GIFs
+# this class is used to display the process status GIFs in the process table
+# a handful of shared QMovies (one per status) are painted by the delegate instead of creating one animated widget per row
 
 
-class ImagePlayer(QWidget):
-    def __init__(self, filename, parent=None):
-        QWidget.__init__(self, parent)
-        # load the file into a QMovie
-        self.movie = QMovie(filename)
-        self.movie_screen = QLabel()
-        self.movie_screen.setSizePolicy(
-            QSizePolicy.Expanding, QSizePolicy.Expanding)
-        main_layout = QVBoxLayout()
-        main_layout.addWidget(self.movie_screen)
-        self.setLayout(main_layout)
-        self.movie.setCacheMode(QMovie.CacheAll)
-        self.movie.setSpeed(100)
-        self.movie_screen.setMovie(self.movie)
-        self.movie.start()
-#       self.show()
+class ProcessStatusDelegate(QStyledItemDelegate):
+    def __init__(self, parent=None):
+        QStyledItemDelegate.__init__(self, parent)
+        self.movies = dict()
+        for status, filename in [('Waiting', './images/waiting.gif'), ('Running', './images/running.gif'), ('Finished', './images/finished.gif'), ('Killed', './images/killed.gif')]:
+            movie = QMovie(filename)
+            movie.setCacheMode(QMovie.CacheAll)
+            movie.setSpeed(100)
+            # repaint the visible part of the table only (the cost does not depend on the number of rows)
+            movie.frameChanged.connect(self.repaintView)
+            movie.start()
+            self.movies.update({status: movie})
+
+    def repaintView(self, frame):
+        if self.parent():
+            self.parent().viewport().update()
+
+    def movieForStatus(self, status):
+        if status in self.movies:
+            return self.movies[status]
+        # crashed, cancelled, etc
+        return self.movies['Killed']
+
+    def paint(self, painter, option, index):
+        # draw the background first (eg: selected row)
+        QStyledItemDelegate.paint(self, painter, option, index)
+        model = index.model()
+        if not model or index.row() >= model.rowCount(None):
+            return
+
+        pixmap = self.movieForStatus(
+            str(model.getProcessStatusForRow(index.row()))).currentPixmap()
+        if pixmap.isNull():
+            return
+
+        # same position as the old QLabel based widget (left aligned, vertically centered)
+        x = option.rect.left() + 10
+        y = option.rect.top() + (option.rect.height() - pixmap.height()) // 2
+        painter.save()
+        painter.setClipRect(option.rect)
+        painter.drawPixmap(x, y, pixmap)
+        painter.restore()
+
+# dialog used to display the full output of a process (the tool tabs only keep the last lines)
+
+
+class ToolOutputDialog(QDialog):
+    def __init__(self, title, filename, parent=None):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle(str(title))
+        self.resize(800, 600)
+
+        # the file is memory-mapped and its lines are indexed in the background, only the visible lines are read
+        self.output = MappedOutput(filename)
+        self.model = OutputLinesModel(self.output)
+        self.indexer = OutputIndexer(self.output)
+
+        self.display = QListView()
+        self.display.setUniformItemSizes(True)
+        self.display.setFont(QFont('Monospace'))
+        self.display.setModel(self.model)
+
+        self.searchInput = QLineEdit()
+        self.searchInput.setPlaceholderText('Search')
+        self.previousButton = QPushButton('Previous')
+        self.nextButton = QPushButton('Next')
+        self.statusLabel = QLabel('Indexing..')
+
+        self.hlayout = QHBoxLayout()
+        self.hlayout.addWidget(self.searchInput)
+        self.hlayout.addWidget(self.previousButton)
+        self.hlayout.addWidget(self.nextButton)
+        self.hlayout.addWidget(self.statusLabel)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.display)
+        layout.addLayout(self.hlayout)
+        self.setLayout(layout)
+
+        self.searchInput.returnPressed.connect(lambda: self.find())
+        self.nextButton.clicked.connect(lambda: self.find())
+        self.previousButton.clicked.connect(lambda: self.find(True))
+        self.indexer.tick.connect(self.model.setLineCount)
+        self.indexer.done.connect(self.indexingFinished)
+        self.indexer.start()
+
+        # the dialog belongs to the main window, so it has to be deleted when it is dismissed (escape, close button, etc)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.finished.connect(self.releaseOutput)
+
+    def indexingFinished(self):
+        self.statusLabel.setText(str(self.output.lineCount()) + ' lines')
+
+    def find(self, backward=False):
+        current = self.display.currentIndex()
+        if current.isValid():
+            row = current.row()
+        elif backward:
+            row = self.output.lineCount()
+        else:
+            row = -1
+
+        found = self.output.find(self.searchInput.text(), row, backward)
+        if found == -1:
+            self.statusLabel.setText('Not found')
+            return
+        self.statusLabel.setText('Line ' + str(found + 1))
+        index = self.model.index(found, 0)
+        self.display.setCurrentIndex(index)
+        self.display.scrollTo(index, QAbstractItemView.PositionAtCenter)
+
+    # frees the mapped file and stops the indexer (can be called more than once)
+    def releaseOutput(self):
+        self.indexer.stop()
+        self.indexer.wait()
+        if not self.output.file.closed:
+            self.output.close()
+        self.deleteLater()
+
+# dialog used to display a screenshot at full size (opened from the screenshot gallery)
+
+
+class ScreenshotDialog(QDialog):
+    def __init__(self, title, filename, parent=None):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle(str(title))
+        self.resize(1000, 700)
+
+        self.viewer = ImageViewer()
+        self.zoomInButton = QPushButton('Zoom in')
+        self.zoomOutButton = QPushButton('Zoom out')
+        self.fitButton = QPushButton('Fit to window')
+        self.normalButton = QPushButton('Original size')
+
+        self.hlayout = QHBoxLayout()
+        self.hlayout.addWidget(self.zoomInButton)
+        self.hlayout.addWidget(self.zoomOutButton)
+        self.hlayout.addWidget(self.fitButton)
+        self.hlayout.addWidget(self.normalButton)
+        self.hlayout.addStretch()
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.viewer.scrollArea)
+        layout.addLayout(self.hlayout)
+        self.setLayout(layout)
+
+        self.zoomInButton.clicked.connect(self.viewer.zoomIn)
+        self.zoomOutButton.clicked.connect(self.viewer.zoomOut)
+        self.fitButton.clicked.connect(lambda: self.viewer.fitToWindow())
+        self.normalButton.clicked.connect(self.viewer.normalSize)
+        self.viewer.open(str(filename))
+
+# dialog that shows the screenshots of every host. the list is virtualised: only the visible thumbnails are loaded
+
+
+class ScreenshotGalleryDialog(QDialog):
+    def __init__(self, model, parent=None):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle('Screenshots')
+        self.resize(1000, 700)
+        self.model = model
+
+        self.filterInput = QLineEdit()
+        self.filterInput.setPlaceholderText('Filter by host or port (eg: 192.168.1.1, :443)')
+        self.countLabel = QLabel()
+
+        self.gallery = QListView()
+        self.gallery.setViewMode(QListView.IconMode)
+        self.gallery.setResizeMode(QListView.Adjust)
+        self.gallery.setMovement(QListView.Static)
+        self.gallery.setUniformItemSizes(True)
+        self.gallery.setLayoutMode(QListView.Batched)
+        self.gallery.setIconSize(QSize(200, 150))
+        self.gallery.setSpacing(5)
+        self.gallery.setModel(self.model)
+
+        self.hlayout = QHBoxLayout()
+        self.hlayout.addWidget(self.filterInput)
+        self.hlayout.addWidget(self.countLabel)
+
+        layout = QVBoxLayout()
+        layout.addLayout(self.hlayout)
+        layout.addWidget(self.gallery)
+        self.setLayout(layout)
+
+        self.filterInput.textChanged.connect(self.applyFilter)
+        self.gallery.doubleClicked.connect(self.openScreenshot)
+        self.finished.connect(self.model.close)
+        self.updateCount()
+
+    def applyFilter(self, text):
+        self.model.setFilter(text)
+        self.updateCount()
+
+    def updateCount(self):
+        self.countLabel.setText(str(self.model.rowCount()) + ' screenshots')
+
+    def openScreenshot(self, index):
+        screenshot = self.model.getScreenshotForRow(index.row())
+        dialog = ScreenshotDialog(str(screenshot['hostip']) + ':' + str(
+            screenshot['port']), self.model.getFilenameForRow(index.row()), self)
+        dialog.show()
+
+# shows what each tool cost us in this project (see ToolStatsTableModel)
+
+
+class ToolStatsDialog(QDialog):
+    def __init__(self, model, parent=None):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle('Tool statistics')
+        self.resize(900, 400)
+
+        self.table = QTableView()
+        self.table.setModel(model)
+        self.table.setSortingEnabled(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.resizeColumnsToContents()
+
+        self.label = QLabel('Only processes run with resource accounting are counted. Memory is the peak of the process and its children. '
+                            'For processes run on a remote worker, memory and CPU time are those of the local relay, not of the tool.')
+        self.label.setWordWrap(True)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addWidget(self.label)
+        self.setLayout(layout)
 
 # dialog shown when the user selects "Add host(s)" from the menu
 
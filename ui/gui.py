@@ -15,7 +15,7 @@ from PyQt5 import QtCore
 from PyQt5.QtCore import Qt, QMetaObject, QSize, QRect
 from PyQt5.QtGui import QIcon, QPixmap, QFont
 from PyQt5.QtWidgets import QWidget, QGridLayout, QSplitter, QTabWidget, QSizePolicy
-from PyQt5.QtWidgets import QLineEdit, QToolButton, QVBoxLayout, QHBoxLayout, QTableView
+from PyQt5.QtWidgets import QLineEdit, QToolButton, QVBoxLayout, QHBoxLayout, QTableView, QTreeView
 from PyQt5.QtWidgets import QTextEdit, QPlainTextEdit, QMenuBar, QMenu, QStatusBar
 from PyQt5.QtWidgets import QAction, QApplication
 from ui.dialogs import ImageViewer
@@ -143,6 +143,16 @@ class Ui_MainWindow(object):
         self.horizontalLayout_3.addWidget(self.ToolsTableView)
         self.HostsTabWidget.addTab(self.ToolsTab, _fromUtf8(""))
 
+        self.SubnetsTab = QWidget()
+        self.SubnetsTab.setObjectName(_fromUtf8("SubnetsTab"))
+        self.horizontalLayout_subnets = QHBoxLayout(self.SubnetsTab)
+        self.horizontalLayout_subnets.setObjectName(
+            _fromUtf8("horizontalLayout_subnets"))
+        self.SubnetsTreeView = QTreeView(self.SubnetsTab)
+        self.SubnetsTreeView.setObjectName(_fromUtf8("SubnetsTreeView"))
+        self.horizontalLayout_subnets.addWidget(self.SubnetsTreeView)
+        self.HostsTabWidget.addTab(self.SubnetsTab, _fromUtf8(""))
+
     def setupRightPanel(self):
         self.ServicesTabWidget = QTabWidget()
         self.ServicesTabWidget.setEnabled(True)
@@ -303,6 +313,10 @@ class Ui_MainWindow(object):
         self.actionNew.setObjectName(_fromUtf8("actionNew"))
         self.actionAddHosts = QAction(MainWindow)
         self.actionAddHosts.setObjectName(_fromUtf8("actionAddHosts"))
+        self.actionScreenshots = QAction(MainWindow)
+        self.actionScreenshots.setObjectName(_fromUtf8("actionScreenshots"))
+        self.actionToolStats = QAction(MainWindow)
+        self.actionToolStats.setObjectName(_fromUtf8("actionToolStats"))
         self.menuFile.addAction(self.actionNew)
         self.menuFile.addAction(self.actionOpen)
         self.menuFile.addAction(self.actionSave)
@@ -311,6 +325,9 @@ class Ui_MainWindow(object):
         self.menuFile.addAction(self.actionAddHosts)
         self.menuFile.addAction(self.actionImportNmap)
         self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionScreenshots)
+        self.menuFile.addAction(self.actionToolStats)
+        self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionExit)
         self.menubar.addAction(self.menuFile.menuAction())
 #       self.menubar.addAction(self.menuEdit.menuAction())
@@ -341,6 +358,8 @@ class Ui_MainWindow(object):
             self.ServicesLeftTab), QApplication.translate("MainWindow", "Services", None))
         self.HostsTabWidget.setTabText(self.HostsTabWidget.indexOf(
             self.ToolsTab), QApplication.translate("MainWindow", "Tools", None))
+        self.HostsTabWidget.setTabText(self.HostsTabWidget.indexOf(
+            self.SubnetsTab), QApplication.translate("MainWindow", "Subnets", None))
         self.ServicesTabWidget.setTabText(self.ServicesTabWidget.indexOf(
             self.ServicesRightTab), QApplication.translate("MainWindow", "Services", None))
         self.ServicesTabWidget.setTabText(self.ServicesTabWidget.indexOf(
@@ -400,6 +419,16 @@ class Ui_MainWindow(object):
             "MainWindow", "Add host(s) to scope", None))
         self.actionAddHosts.setShortcut(
             QApplication.translate("MainWindow", "Ctrl+H", None))
+        self.actionScreenshots.setText(QApplication.translate(
+            "MainWindow", "Screenshot gallery", None))
+        self.actionScreenshots.setToolTip(QApplication.translate(
+            "MainWindow", "Browse the screenshots of every host", None))
+        self.actionScreenshots.setShortcut(
+            QApplication.translate("MainWindow", "Ctrl+G", None))
+        self.actionToolStats.setText(QApplication.translate(
+            "MainWindow", "Tool statistics", None))
+        self.actionToolStats.setToolTip(QApplication.translate(
+            "MainWindow", "Time, CPU, memory and output used by each tool", None))
         # self.actionSettings.setText(QApplication.translate("MainWindow", "Preferences", None))
         self.actionHelp.setText(
             QApplication.translate("MainWindow", "Help", None))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+'''
+SPARTA - Network Infrastructure Penetration Testing Tool (http://sparta.secforce.com)
+Copyright (c) 2020 SECFORCE (Antonio Quina and Leonidas Stavliotis)
+
+    This program is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from PyQt5.QtCore import QObject, QTimer, QCoreApplication
+
+# the headless mode runs the controller (staged nmaps, nmap imports and the scheduler) without creating any widget, so
+# that SPARTA can run on a server with no display. everything is stored in the project file, which can be opened in the GUI.
+
+# replaces the tool output widgets: the output is only written to the log file (see OutputSink)
+
+
+class HeadlessDisplay(QObject):
+    def __init__(self, ip, tabtitle):
+        QObject.__init__(self)
+        self.ip = ip
+        self.tabtitle = tabtitle
+
+    def appendPlainText(self, text):
+        pass
+
+    def clear(self):
+        pass
+
+    def setMaximumBlockCount(self, count):
+        pass
+
+    def parentWidget(self):
+        return None
+
+# replaces the progress bar of the nmap importer
+
+
+class HeadlessProgress(QObject):
+    def __init__(self):
+        QObject.__init__(self)
+        self.text = ''
+
+    def reset(self, text):
+        self.text = text
+
+    def setProgress(self, progress):
+        pass
+
+    def show(self):
+        print('[+] ' + self.text)
+
+    def hide(self):
+        pass
+
+# implements the part of the View used by the controller. there is nothing to refresh, so most functions do nothing.
+
+
+class HeadlessView(QObject):
+    def __init__(self, resume=True):
+        QObject.__init__(self)
+        # what to do with the processes of a previous session when a project is opened
+        self.resume = resume
+        self.menuVisible = False
+        self.ProcessesTableModel = None
+        self.importProgressWidget = HeadlessProgress()
+
+    def setController(self, controller):
+        self.controller = controller
+
+    def start(self, title='*untitled'):
+        print('[+] Project: ' + str(title))
+
+    def closeProject(self):
+        self.controller.closeProject()
+
+    def resumeProcessesConfirmation(self, waiting, interrupted):
+        if self.resume:
+            print('[+] Resuming ' + str(waiting) + ' waiting and ' +
+                  str(interrupted) + ' interrupted processes.')
+        return self.resume
+
+    def killProcessConfirmation(self):
+        return True
+
+    def getCurrentHostsTab(self):
+        return ''
+
+    def createNewTabForHost(self, ip, tabtitle, restoring=False, content='', filename=''):
+        return HeadlessDisplay(ip, tabtitle)
+
+    def createNewBruteTab(self, ip, port, service):
+        pass
+
+    def findFinishedBruteTab(self, pid):
+        pass
+
+    def blinkBruteTab(self, bWidget):
+        pass
+
+    def removePendingToolTab(self, ip, dbId):
+        pass
+
+    def restoreToolTabs(self):
+        pass
+
+    def switchTabClick(self):
+        pass
+
+    def hostTableClick(self):
+        pass
+
+    def displayAddHostsOverlay(self, display=False):
+        pass
+
+    def updateInterface(self):
+        pass
+
+    def updateProcessesTableView(self):
+        pass
+
+    def updateToolsTableView(self):
+        pass
+
+    def updateRightPanelForHosts(self, hosts):
+        pass
+
+# checks every few seconds if there is anything left to do and closes the project when there isn't. the controller is
+# only considered idle after two checks in a row, since imports and scheduled tools are started through queued signals.
+
+
+class HeadlessRunner(QObject):
+    def __init__(self, controller, interval=2000):
+        QObject.__init__(self)
+        self.controller = controller
+        self.idleChecks = 0
+        self.stopped = False
+        self.timer = QTimer()
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        self.timer.start()
+
+    def check(self):
+        if not self.controller.isIdle():
+            self.idleChecks = 0
+            return
+        self.idleChecks += 1
+        if self.idleChecks >= 2:
+            print('[+] Nothing left to do.')
+            self.stop()
+
+    # interrupted: the running processes are killed but they are resumed the next time the project is opened
+    def stop(self, interrupted=False):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.timer.stop()
+        if interrupted:
+            self.controller.killRunningProcesses(True)
+        self.controller.closeProject()
+        print('[+] The project was saved in ' + str(self.controller.logic.projectname))
+        QCoreApplication.quit()
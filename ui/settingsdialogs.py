@@ -154,6 +154,8 @@ class AddSettingsDialog(QDialog):
             self.terminalComboBox.currentText())
         self.settings.general_max_fast_processes = str(
             self.fastProcessesComboBox.currentText())
+        self.settings.general_max_slow_processes = str(
+            self.slowProcessesComboBox.currentText())
         self.settings.general_screenshooter_timeout = str(
             self.screenshotTextinput.text())
         self.settings.general_web_services = str(
@@ -236,6 +238,8 @@ class AddSettingsDialog(QDialog):
 
         self.fastProcessesComboBox.setCurrentIndex(
             int(self.settings.general_max_fast_processes) - 1)
+        self.slowProcessesComboBox.setCurrentIndex(
+            int(self.settings.general_max_slow_processes) - 1)
         self.screenshotTextinput.setText(
             str(self.settings.general_screenshooter_timeout))
         self.webServicesTextinput.setText(
@@ -1067,7 +1071,7 @@ class AddSettingsDialog(QDialog):
         self.hlayout1.addStretch()
 
         self.label3 = QLabel()
-        self.label3.setText('Maximum processes')
+        self.label3.setText('Maximum fast processes')
         self.label3.setFixedWidth(150)
         self.fastProcessesNumber = []
         for i in range(1, 50):
@@ -1085,6 +1089,22 @@ class AddSettingsDialog(QDialog):
         self.hlayoutGeneral_4.addWidget(self.fastProcessesComboBox)
         self.hlayoutGeneral_4.addStretch()
 
+        self.label4 = QLabel()
+        self.label4.setText('Maximum slow processes')
+        self.label4.setFixedWidth(150)
+        self.slowProcessesComboBox = QComboBox()
+        self.slowProcessesComboBox.insertItems(0, self.fastProcessesNumber)
+        self.slowProcessesComboBox.setMinimumContentsLength(3)
+        self.slowProcessesComboBox.setStyleSheet(
+            "QComboBox { combobox-popup: 0; }")
+        self.slowProcessesComboBox.setCurrentIndex(9)
+        self.slowProcessesComboBox.setFixedWidth(150)
+        self.slowProcessesComboBox.setMaxVisibleItems(3)
+        self.hlayoutGeneral_5 = QHBoxLayout()
+        self.hlayoutGeneral_5.addWidget(self.label4)
+        self.hlayoutGeneral_5.addWidget(self.slowProcessesComboBox)
+        self.hlayoutGeneral_5.addStretch()
+
         self.label1 = QLabel()
         self.label1.setText('Screenshot timeout')
         self.label1.setFixedWidth(150)
@@ -1118,6 +1138,7 @@ class AddSettingsDialog(QDialog):
         self.vlayoutGeneral = QVBoxLayout(self.GeneralSettingsTab)
         self.vlayoutGeneral.addLayout(self.hlayout1)
         self.vlayoutGeneral.addLayout(self.hlayoutGeneral_4)
+        self.vlayoutGeneral.addLayout(self.hlayoutGeneral_5)
         self.vlayoutGeneral.addLayout(self.hlayoutGeneral_2)
         self.vlayoutGeneral.addLayout(self.hlayoutGeneral_3)
         self.vlayoutGeneral.addLayout(self.hlayoutGeneral_6)
@@ -17,18 +17,22 @@ import ntpath
 import signal
 import re
 import time
+import hashlib
 import webbrowser
 from PyQt5.QtGui import QColor, QPalette
-from PyQt5.QtCore import QVariant, QObject, pyqtSignal, Qt
+from PyQt5.QtCore import QVariant, QObject, pyqtSignal, Qt, QTimer, QModelIndex
 from PyQt5.QtWidgets import QTabBar, QMenu, QMessageBox, QFileDialog, QPlainTextEdit, QWidget, QHBoxLayout
 # from ui.gui import *
-from ui.dialogs import HostInformationWidget, FiltersDialog, ProgressWidget, AddHostsDialog, ImagePlayer, ImageViewer, BruteWidget
+from ui.dialogs import HostInformationWidget, FiltersDialog, ProgressWidget, AddHostsDialog, ProcessStatusDelegate, ImageViewer, BruteWidget, ToolOutputDialog, ScreenshotGalleryDialog, ToolStatsDialog
 # from ui.settingsdialogs import *
 from app.hostmodels import HostsTableModel
-from app.servicemodels import ServicesTableModel, ServiceNamesTableModel
+from app.servicemodels import ServicesTableModel, ServiceNamesTableModel, PagedServicesTableModel
 from app.scriptmodels import ScriptsTableModel
-from app.processmodels import ProcessesTableModel
+from app.processmodels import ProcessesTableModel, ToolStatsTableModel
+from app.screenshotmodels import ScreenshotsListModel
+from app.subnetmodels import SubnetsTreeModel
 from app.auxiliary import Filters, setTableProperties, validateNmapInput, validateCredentials, getTimestamp
+from app.output import readOutputTail, verifyOutputLog
 
 
 # this class handles everything gui-related
@@ -69,6 +73,18 @@ class View(QObject):
         if not os.path.exists(self.helpurl):
             self.helpurl = '/usr/share/doc/sparta/help.html'
 
+        # prefetches the right panel data of the hosts next to the selected one when the UI is idle
+        self.prefetchTimer = QTimer()
+        self.prefetchTimer.setSingleShot(True)
+        self.prefetchTimer.setInterval(50)
+        self.prefetchTimer.timeout.connect(self.prefetchHostDetails)
+
+        # debounces the autosave of the notes
+        self.notesTimer = QTimer()
+        self.notesTimer.setSingleShot(True)
+        self.notesTimer.setInterval(2000)
+        self.notesTimer.timeout.connect(self.saveNotes)
+
         # disable multiple selection
         self.ui.HostsTableView.setSelectionMode(1)
         self.ui.ServiceNamesTableView.setSelectionMode(1)
@@ -76,6 +92,12 @@ class View(QObject):
         self.ui.ScriptsTableView.setSelectionMode(1)
         self.ui.ToolHostsTableView.setSelectionMode(1)
 
+        # the progress column of the process table is painted by a delegate (shared GIFs instead of one widget per row)
+        self.processStatusDelegate = ProcessStatusDelegate(
+            self.ui.ProcessesTableView)
+        self.ui.ProcessesTableView.setItemDelegateForColumn(
+            0, self.processStatusDelegate)
+
     # initialisations (globals, etc)
     def start(self, title='*untitled'):
         # to know if the project has been saved
@@ -84,6 +106,12 @@ class View(QObject):
         self.firstSave = True
         # to keep track of which tabs should be displayed for each host
         self.hostTabs = dict()
+        # tabs of an opened project that have not been created yet (ip -> list of [dbId, tabtitle, outputfile])
+        self.pendingToolTabs = dict()
+        # hosts whose restored tabs have been created, least recently viewed first
+        self.restoredToolTabHosts = []
+        # maximum number of hosts for which we keep the restored tabs in memory
+        self.maxRestoredToolTabHosts = 20
         # to keep track of the numbering of the bruteforce tabs (incremented when a new tab is added)
         self.bruteTabCount = 1
 
@@ -95,6 +123,9 @@ class View(QObject):
 
         # TODO: check if we can get rid of this one.
         self.lastHostIdClicked = ''
+        # hash of the notes as they are in the DB and whether the user has changed them since
+        self.notesHash = self.getNotesHash('')
+        self.notesDirty = False
         # useful when updating interfaces (serves as memory)
         self.ip_clicked = ''
         # useful when updating interfaces (serves as memory)
@@ -114,6 +145,8 @@ class View(QObject):
         self.menuVisible = False
         # fixes bug when sorting processes for the first time
         self.ProcessesTableModel = None
+        # the subnets tree is built the first time its tab is shown
+        self.SubnetsTreeModel = None
 
         self.setMainWindowTitle(title)
         self.ui.statusbar.showMessage('Starting up..', msecs=1000)
@@ -162,6 +195,7 @@ class View(QObject):
         self.connectSaveProjectAs()
         self.connectAddHosts()
         self.connectImportNmap()
+        self.connectScreenshotGallery()
         # self.connectSettings()
         self.connectHelp()
         self.connectAppExit()
@@ -179,6 +213,7 @@ class View(QObject):
         self.connectSwitchMainTabClick()
         # for double clicking on host (it redirects to the host view)
         self.connectTableDoubleClick()
+        self.connectSubnetsTreeDoubleClick()
         ### CONTEXT MENUS ###
         self.connectHostsTableContextMenu()
         self.connectServiceNamesTableContextMenu()
@@ -188,6 +223,7 @@ class View(QObject):
         self.connectScreenshotContextMenu()
         ### OTHER ###
         self.ui.NotesTextEdit.textChanged.connect(self.setDirty)
+        self.ui.NotesTextEdit.textChanged.connect(self.notesChanged)
         self.ui.FilterApplyButton.clicked.connect(self.updateFilterKeywords)
         self.ui.ServicesTabWidget.tabCloseRequested.connect(
             self.closeHostToolTab)
@@ -310,6 +346,15 @@ class View(QObject):
                                      "Are you sure to exit the program?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         return (reply == QMessageBox.Yes)
 
+    def resumeProcessesConfirmation(self, waiting, interrupted):
+        message = "When this project was last closed " + str(waiting) + " processes were waiting to run and " + str(
+            interrupted) + " processes were interrupted. Do you want to run them now?"
+        reply = QMessageBox.question(
+            self.ui.centralwidget, 'Resume processes', message, QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if reply == QMessageBox.Yes:
+            return True
+        return False
+
     def killProcessConfirmation(self):
         message = "Are you sure you want to kill the selected processes?"
         reply = QMessageBox.question(
@@ -366,8 +411,7 @@ class View(QObject):
             self.saveProjectAs()
         else:
             print('[+] Saving project..')
-            self.controller.saveProject(
-                self.lastHostIdClicked, self.ui.NotesTextEdit.toPlainText())
+            self.saveNotes()
 
             self.setDirty(False)
             self.ui.statusbar.showMessage('Saved!', msecs=1000)
@@ -382,8 +426,7 @@ class View(QObject):
         self.ui.statusbar.showMessage('Saving..')
         print('[+] Saving project..')
 
-        self.controller.saveProject(
-            self.lastHostIdClicked, self.ui.NotesTextEdit.toPlainText())
+        self.saveNotes()
 
         filename = QFileDialog.getSaveFileName(self.ui.centralwidget, 'Save project as', self.controller.getCWD(
         ), filter='SPARTA project (*.sprt)', options=QFileDialog.DontConfirmOverwrite)[0]
@@ -474,6 +517,26 @@ class View(QObject):
 
     ###
 
+    def connectScreenshotGallery(self):
+        self.ui.actionScreenshots.triggered.connect(self.showScreenshotGallery)
+        self.ui.actionToolStats.triggered.connect(self.showToolStats)
+
+    def showToolStats(self):
+        headers = ["Tool", "Runs", "Total time", "Average time", "Longest",
+                   "Total CPU", "Average CPU", "Peak memory", "Output"]
+        model = ToolStatsTableModel(
+            self.controller.getToolStatsFromDB(), headers)
+        self.toolStats = ToolStatsDialog(model, self.ui.centralwidget)
+        self.toolStats.show()
+
+    def showScreenshotGallery(self):
+        model = ScreenshotsListModel(self.controller.getScreenshotsFromDB(), str(
+            self.controller.getOutputFolder())+'/screenshots', self.controller.getThumbnailGenerator())
+        self.screenshotGallery = ScreenshotGalleryDialog(model, self.ui.centralwidget)
+        self.screenshotGallery.show()
+
+    ###
+
     def connectImportNmap(self):
         self.ui.actionImportNmap.triggered.connect(self.importNmap)
 
@@ -643,6 +706,7 @@ class View(QObject):
                         QPlainTextEdit).setParent(None)
 
                 # fetch tab list for this host (if any)
+                self.loadToolTabsForHost(ip)
                 tabs = []
                 if str(ip) in self.hostTabs:
                     tabs = self.hostTabs[str(ip)]
@@ -704,6 +768,26 @@ class View(QObject):
 
     ###
 
+    def connectSubnetsTreeDoubleClick(self):
+        self.ui.SubnetsTreeView.doubleClicked.connect(self.subnetsTreeDoubleClick)
+
+    # double clicking a host in the subnets tree shows it in the hosts tab
+    def subnetsTreeDoubleClick(self, index):
+        ip = self.SubnetsTreeModel.getHostIPForIndex(index)
+        if ip is None:
+            return
+        if self.lazy_update_hosts == True:
+            self.updateHostsTableView()
+        hostrow = self.HostsTableModel.getRowForIp(ip)
+        if hostrow is not None:
+            self.ui.HostsTabWidget.setCurrentIndex(0)
+            self.ui.HostsTableView.selectRow(hostrow)
+            self.hostTableClick()
+
+    # the title of the tab selected in the left panel (Hosts, Services or Tools)
+    def getCurrentHostsTab(self):
+        return self.ui.HostsTabWidget.tabText(self.ui.HostsTabWidget.currentIndex())
+
     def connectSwitchTabClick(self):
         self.ui.HostsTabWidget.currentChanged.connect(self.switchTabClick)
 
@@ -735,8 +819,7 @@ class View(QObject):
                 self.ui.ServicesTabWidget.setCurrentIndex(0)
                 # remove the tool tabs
                 self.removeToolTabs(0)
-                self.controller.saveProject(
-                    self.lastHostIdClicked, self.ui.NotesTextEdit.toPlainText())
+                self.saveNotes()
                 if self.lazy_update_services == True:
                     self.updateServiceNamesTableView()
                 self.serviceNamesTableClick()
@@ -744,6 +827,9 @@ class View(QObject):
             elif selectedTab == 'Tools':
                 self.updateToolsTableView()
 
+            elif selectedTab == 'Subnets':
+                self.updateSubnetsTreeView()
+
             # display tool panel if we are in tools tab, hide it otherwise
             self.displayToolPanel(selectedTab == 'Tools')
 
@@ -840,28 +926,14 @@ class View(QObject):
                 if action.text() == 'Take screenshot':
                     tool = 'screenshooter'
 
-                # get (IP,port,protocol) combinations for this service
-                targets = []
-                for row in range(self.PortsByServiceTableModel.rowCount("")):
-                    targets.append([self.PortsByServiceTableModel.getIpForRow(row), self.PortsByServiceTableModel.getPortForRow(
-                        row), self.PortsByServiceTableModel.getProtocolForRow(row)])
-
                 # if the user pressed SHIFT+Right-click, ignore the rule of only running the tool on targets on which we haven't ran it yet
                 if shiftPressed:
                     tool = None
 
-                if tool:
-                    # fetch the hosts that we already ran the tool on
-                    hosts = self.controller.getHostsForTool(tool, 'FetchAll')
-                    oldTargets = []
-                    for i in range(0, len(hosts)):
-                        oldTargets.append(
-                            [hosts[i][5], hosts[i][6], hosts[i][7]])
-
-                    # remove from the targets the hosts:ports we have already run the tool on
-                    for host in oldTargets:
-                        if host in targets:
-                            targets.remove(host)
+                # get (IP,port,protocol) combinations for this service from the DB (the table only has the rows loaded so far)
+                # leaving out the hosts:ports we have already run the tool on
+                targets = self.controller.getTargetsForServiceFromDB(
+                    self.service_clicked, self.filters, tool)
 
                 self.controller.handleServiceNameAction(
                     targets, actions, action)
@@ -1040,7 +1112,7 @@ class View(QObject):
         # to indicate that it doesn't need to be updated anymore
         self.lazy_update_hosts = False
 
-        for i in [0, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]:                   # hide some columns
+        for i in [0, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16]:               # hide some columns
             self.ui.HostsTableView.setColumnHidden(i, True)
 
         # self.ui.HostsTableView.horizontalHeader().setResizeMode(1,2)
@@ -1048,14 +1120,9 @@ class View(QObject):
         self.HostsTableModel.sort(3, Qt.DescendingOrder)
 
         # ensure that there is always something selected
-        ips = []
-        for row in range(self.HostsTableModel.rowCount("")):
-            ips.append(self.HostsTableModel.getHostIPForRow(row))
-
         # the ip we previously clicked may not be visible anymore (eg: due to filters)
-        if self.ip_clicked in ips:
-            row = self.HostsTableModel.getRowForIp(self.ip_clicked)
-        else:
+        row = self.HostsTableModel.getRowForIp(self.ip_clicked)
+        if row is None:
             # or select the first row
             row = 0
 
@@ -1063,6 +1130,34 @@ class View(QObject):
             self.ui.HostsTableView.selectRow(row)
             self.hostTableClick()
 
+    # the tree is rebuilt from the /16 subnets, the subnets that were expanded are expanded again (and fetched) afterwards
+    def updateSubnetsTreeView(self):
+        headers = ["Subnet", "Hosts", "Up", "Open ports", "Services"]
+        expanded = []
+        if self.SubnetsTreeModel:
+            expanded = self.getExpandedSubnets()
+
+        self.SubnetsTreeModel = SubnetsTreeModel(
+            self.controller, self.filters, headers)
+        self.ui.SubnetsTreeView.setModel(self.SubnetsTreeModel)
+        self.ui.SubnetsTreeView.header().resizeSection(0, 180)
+
+        for label in expanded:
+            for index in self.SubnetsTreeModel.match(self.SubnetsTreeModel.index(0, 0), Qt.DisplayRole, label, 1, Qt.MatchExactly | Qt.MatchRecursive):
+                self.ui.SubnetsTreeView.expand(index)
+
+    def getExpandedSubnets(self):
+        expanded = []
+        parents = [QModelIndex()]
+        while parents:
+            parent = parents.pop()
+            for row in range(self.SubnetsTreeModel.rowCount(parent)):
+                index = self.SubnetsTreeModel.index(row, 0, parent)
+                if self.ui.SubnetsTreeView.isExpanded(index):
+                    expanded.append(index.data())
+                    parents.append(index)
+        return expanded
+
     def updateServiceNamesTableView(self):
         headers = ["Name"]
         self.ServiceNamesTableModel = ServiceNamesTableModel(
@@ -1073,16 +1168,10 @@ class View(QObject):
         self.lazy_update_services = False
 
         # ensure that there is always something selected
-        services = []
-        for row in range(self.ServiceNamesTableModel.rowCount("")):
-            services.append(
-                self.ServiceNamesTableModel.getServiceNameForRow(row))
-
         # the service we previously clicked may not be visible anymore (eg: due to filters)
-        if self.service_clicked in services:
-            row = self.ServiceNamesTableModel.getRowForServiceName(
-                self.service_clicked)
-        else:
+        row = self.ServiceNamesTableModel.getRowForServiceName(
+            self.service_clicked)
+        if row is None:
             # or select the first row
             row = 0
 
@@ -1105,14 +1194,9 @@ class View(QObject):
                 self.ui.ToolsTableView.setColumnHidden(i, True)
 
             # ensure that there is always something selected
-            tools = []
-            for row in range(self.ToolsTableModel.rowCount("")):
-                tools.append(self.ToolsTableModel.getToolNameForRow(row))
-
             # the tool we previously clicked may not be visible anymore (eg: due to filters)
-            if self.tool_clicked in tools:
-                row = self.ToolsTableModel.getRowForToolName(self.tool_clicked)
-            else:
+            row = self.ToolsTableModel.getRowForToolName(self.tool_clicked)
+            if row is None:
                 row = 0                                                 # or select the first row
 
             if not row == None:
@@ -1124,8 +1208,12 @@ class View(QObject):
     def updateServiceTableView(self, hostIP):
         headers = ["Host", "Port", "Port", "Protocol", "State", "HostId",
                    "ServiceId", "Name", "Product", "Version", "Extrainfo", "Fingerprint"]
-        self.ServicesTableModel = ServicesTableModel(
-            self.controller.getPortsAndServicesForHostFromDB(hostIP, self.filters), headers)
+        details = self.getHostDetailsForIp(hostIP)
+        if details:
+            ports = details.getPorts(self.filters)
+        else:
+            ports = self.controller.getPortsAndServicesForHostFromDB(hostIP, self.filters)
+        self.ServicesTableModel = ServicesTableModel(ports, headers)
         self.ui.ServicesTableView.setModel(self.ServicesTableModel)
 
         # reset all the hidden columns
@@ -1142,15 +1230,17 @@ class View(QObject):
     def updatePortsByServiceTableView(self, serviceName):
         headers = ["Host", "Port", "Port", "Protocol", "State", "HostId",
                    "ServiceId", "Name", "Product", "Version", "Extrainfo", "Fingerprint"]
-        self.PortsByServiceTableModel = ServicesTableModel(
-            self.controller.getHostsAndPortsForServiceFromDB(serviceName, self.filters), headers)
+        filters = self.filters
+        self.PortsByServiceTableModel = PagedServicesTableModel(lambda after, limit, descending, orderBy: self.controller.getHostsAndPortsForServiceFromDB(
+            serviceName, filters, after, limit, descending, orderBy), self.controller.countHostsAndPortsForServiceFromDB(serviceName, filters), headers)
         self.ui.ServicesTableView.setModel(self.PortsByServiceTableModel)
 
         # reset all the hidden columns
         for i in range(0, len(headers)):
             self.ui.ServicesTableView.setColumnHidden(i, False)
 
-        for i in [2, 5, 6, 7, 8, 10, 11]:                                     # hide some columns
+        # the last columns are the keys used to fetch the next page
+        for i in [2, 5, 6, 7, 8, 10, 11, 12, 13, 14, 15, 16]:                 # hide some columns
             self.ui.ServicesTableView.setColumnHidden(i, True)
 
         # self.ui.ServicesTableView.horizontalHeader().setResizeMode(0)
@@ -1158,25 +1248,16 @@ class View(QObject):
         self.ui.ServicesTableView.horizontalHeader().resizeSection(1, 65)    # resize port
         self.ui.ServicesTableView.horizontalHeader(
         ).resizeSection(3, 100)   # resize protocol
-        # sort by IP by default (override default)
-        self.PortsByServiceTableModel.sort(0, Qt.DescendingOrder)
+        # the rows are already sorted by IP (and port) by the DB
 
     def updateInformationView(self, hostIP):
 
         if hostIP:
-            host = self.controller.getHostInformation(hostIP)
-
-            if host:
-                states = self.controller.getPortStatesForHost(host.id)
-                counterOpen = counterClosed = counterFiltered = 0
+            details = self.getHostDetailsForIp(hostIP)
 
-                for s in states:
-                    if s[0] == 'open':
-                        counterOpen += 1
-                    elif s[0] == 'closed':
-                        counterClosed += 1
-                    else:
-                        counterFiltered += 1
+            if details:
+                host = details.host
+                counterOpen, counterClosed, counterFiltered = details.getPortCounts()
 
                 if host.state == 'closed':                              # check the extra ports
                     counterClosed = 65535 - counterOpen - counterFiltered
@@ -1188,23 +1269,21 @@ class View(QObject):
 
     def updateScriptsView(self, hostIP):
         headers = ["Id", "Script", "Port", "Protocol"]
-        self.ScriptsTableModel = ScriptsTableModel(
-            self, self.controller.getScriptsFromDB(hostIP), headers)
+        details = self.getHostDetailsForIp(hostIP)
+        if details:
+            scripts = details.scripts
+        else:
+            scripts = self.controller.getScriptsFromDB(hostIP)
+        self.ScriptsTableModel = ScriptsTableModel(self, scripts, headers)
         self.ui.ScriptsTableView.setModel(self.ScriptsTableModel)
 
         for i in [0, 3]:                                                 # hide some columns
             self.ui.ScriptsTableView.setColumnHidden(i, True)
 
         # ensure that there is always something selected
-        scripts = []
-        for row in range(self.ScriptsTableModel.rowCount("")):
-            scripts.append(self.ScriptsTableModel.getScriptDBIdForRow(row))
-
         # the script we previously clicked may not be visible anymore (eg: due to filters)
-        if self.script_clicked in scripts:
-            row = self.ScriptsTableModel.getRowForDBId(self.script_clicked)
-
-        else:
+        row = self.ScriptsTableModel.getRowForDBId(self.script_clicked)
+        if row is None:
             # or select the first row
             row = 0
 
@@ -1213,27 +1292,62 @@ class View(QObject):
             self.scriptTableClick()
 
     def updateScriptsOutputView(self, scriptId):
-        self.ui.ScriptsOutputTextEdit.clear()
-        lines = self.controller.getScriptOutputFromDB(scriptId)
-        for l in lines:
-            self.ui.ScriptsOutputTextEdit.insertPlainText(l.output.rstrip())
+        output = None
+        details = self.getHostDetailsForIp(self.ip_clicked)
+        if details:
+            output = details.getScriptOutput(scriptId)
+        if output is None:
+            lines = self.controller.getScriptOutputFromDB(scriptId)
+            output = ''.join([str(l.output or '').rstrip() for l in lines])
+        self.ui.ScriptsOutputTextEdit.setPlainText(str(output).rstrip())
 
     # TODO: check if this hack can be improved because we are calling setDirty more than we need
     def updateNotesView(self, hostid):
         self.lastHostIdClicked = str(hostid)
-        note = self.controller.getNoteFromDB(hostid)
+        details = None
+        if hostid:
+            details = self.controller.getHostDetails(hostid)
 
         # save the status so we can restore it after we update the note panel
         saved_dirty = self.dirty
+        text = ''
+        if details and details.note:
+            text = details.note
+
+        # loading the notes of another host is not an edit
+        self.ui.NotesTextEdit.blockSignals(True)
         # clear the text box from the previous notes
         self.ui.NotesTextEdit.clear()
-
-        if note:
-            self.ui.NotesTextEdit.insertPlainText(note.text)
+        self.ui.NotesTextEdit.insertPlainText(text)
+        self.ui.NotesTextEdit.blockSignals(False)
+        self.notesHash = self.getNotesHash(self.ui.NotesTextEdit.toPlainText())
+        self.notesDirty = False
+        self.notesTimer.stop()
 
         if saved_dirty == False:
             self.setDirty(False)
 
+    def getNotesHash(self, text):
+        return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+    # the notes are saved a moment after the user stops typing (and before switching to another host)
+    def notesChanged(self):
+        self.notesDirty = True
+        self.notesTimer.start()
+
+    # writes the notes of the current host, but only if they really changed since they were loaded or last saved
+    def saveNotes(self):
+        self.notesTimer.stop()
+        if not self.notesDirty:
+            return
+        self.notesDirty = False
+        text = self.ui.NotesTextEdit.toPlainText()
+        notesHash = self.getNotesHash(text)
+        if notesHash == self.notesHash:
+            return
+        self.controller.saveProject(self.lastHostIdClicked, text)
+        self.notesHash = notesHash
+
     def updateToolHostsTableView(self, toolname):
         headers = ["Progress", "Display", "Pid", "Name", "Action", "Target", "Port",
                    "Protocol", "Command", "Start time", "OutputFile", "Output", "Status", "Closed"]
@@ -1248,16 +1362,9 @@ class View(QObject):
             5, 150)  # default width for Host column
 
         # ensure that there is always something selected
-        ids = []
-        for row in range(self.ToolHostsTableModel.rowCount("")):
-            ids.append(self.ToolHostsTableModel.getProcessIdForRow(row))
-
         # the host we previously clicked may not be visible anymore (eg: due to filters)
-        if self.tool_host_clicked in ids:
-            row = self.ToolHostsTableModel.getRowForDBId(
-                self.tool_host_clicked)
-
-        else:
+        row = self.ToolHostsTableModel.getRowForDBId(self.tool_host_clicked)
+        if row is None:
             # or select the first row
             row = 0
 
@@ -1270,15 +1377,50 @@ class View(QObject):
         self.updateScriptsView(hostIP)
         # populate host info tab
         self.updateInformationView(hostIP)
-        self.controller.saveProject(
-            self.lastHostIdClicked, self.ui.NotesTextEdit.toPlainText())
+        self.saveNotes()
 
         if hostIP:
-            self.updateNotesView(self.HostsTableModel.getHostIdForRow(
-                self.HostsTableModel.getRowForIp(hostIP)))
+            self.updateNotesView(self.getHostIdForIp(hostIP))
         else:
             self.updateNotesView('')
 
+        # load the hosts above and below while the user is looking at this one
+        self.prefetchTimer.start()
+
+    def getHostIdForIp(self, hostIP):
+        row = self.HostsTableModel.getRowForIp(hostIP)
+        if row is None:
+            return ''
+        return self.HostsTableModel.getHostIdForRow(row)
+
+    # the details are cached by host id (see resultcache.HostDetailsCache)
+    def getHostDetailsForIp(self, hostIP):
+        hostId = self.getHostIdForIp(hostIP)
+        if hostId == '':
+            return None
+        return self.controller.getHostDetails(hostId)
+
+    # fetches the details of the neighbouring rows of the selected host, one host per timer tick so that the UI stays responsive
+    def prefetchHostDetails(self):
+        if not self.ip_clicked:
+            return
+        row = self.HostsTableModel.getRowForIp(self.ip_clicked)
+        if row is None:
+            return
+        for r in [row + 1, row - 1, row + 2, row - 2]:
+            if r < 0 or r >= self.HostsTableModel.rowCount(None):
+                continue
+            hostId = self.HostsTableModel.getHostIdForRow(r)
+            if not self.controller.isHostDetailsCached(hostId):
+                self.controller.getHostDetails(hostId)
+                self.prefetchTimer.start()
+                return
+
+    # called by the refresh scheduler when the data of some hosts has changed (eg: portscan results were purged)
+    def updateRightPanelForHosts(self, hosts):
+        if self.ip_clicked in hosts and self.ui.HostsTabWidget.tabText(self.ui.HostsTabWidget.currentIndex()) == 'Hosts':
+            self.updateRightPanel(self.ip_clicked)
+
     def displayToolPanel(self, display=False):
         size = self.ui.splitter.parentWidget().width() - 210 - \
             24       # note: 24 is a fixed value
@@ -1327,7 +1469,8 @@ class View(QObject):
 
     def updateProcessesTableView(self):
         headers = ["Progress", "Display", "Pid", "Name", "Tool", "Host", "Port", "Protocol",
-                   "Command", "Start time", "End time", "OutputFile", "Output", "Status", "Closed"]
+                   "Command", "Start time", "End time", "OutputFile", "Output", "Status", "Closed", "Priority",
+                   "Peak memory", "CPU time", "Wall time", "Output size"]
         self.ProcessesTableModel = ProcessesTableModel(
             self, self.controller.getProcessesFromDB(self.filters, True), headers)
         self.ui.ProcessesTableView.setModel(self.ProcessesTableModel)
@@ -1342,24 +1485,10 @@ class View(QObject):
         self.ui.ProcessesTableView.horizontalHeader().resizeSection(10, 165)
         self.updateProcessesIcon()
 
+    # the status GIFs are painted by the delegate so we only need to repaint the visible rows
     def updateProcessesIcon(self):
         if self.ProcessesTableModel:
-            for row in range(len(self.ProcessesTableModel.getProcesses())):
-                status = self.ProcessesTableModel.getProcesses()[row].status
-
-                if status == 'Waiting':
-                    self.runningWidget = ImagePlayer("./images/waiting.gif")
-                elif status == 'Running':
-                    self.runningWidget = ImagePlayer("./images/running.gif")
-                elif status == 'Finished':
-                    self.runningWidget = ImagePlayer("./images/finished.gif")
-                elif status == 'Crashed':  # TODO: replace gif?
-                    self.runningWidget = ImagePlayer("./images/killed.gif")
-                else:
-                    self.runningWidget = ImagePlayer("./images/killed.gif")
-
-                self.ui.ProcessesTableView.setIndexWidget(
-                    self.ui.ProcessesTableView.model().index(row, 0), self.runningWidget)
+            self.ui.ProcessesTableView.viewport().update()
 
     #################### GLOBAL INTERFACE UPDATE FUNCTION ####################
 
@@ -1382,6 +1511,12 @@ class View(QObject):
             self.lazy_update_hosts = True
             self.lazy_update_services = True
 
+        if self.ui.HostsTabWidget.tabText(self.ui.HostsTabWidget.currentIndex()) == 'Subnets':
+            self.updateSubnetsTreeView()
+            self.lazy_update_hosts = True
+            self.lazy_update_services = True
+            self.lazy_update_tools = True
+
     #################### TOOL TABS ####################
 
     # this function creates a new tool tab for a given host
@@ -1411,6 +1546,7 @@ class View(QObject):
                 tempTextView.setStyleSheet("QMenu { color:black;}")
             tempLayout = QHBoxLayout(tempWidget)
             tempLayout.addWidget(tempTextView)
+            self.connectToolOutputContextMenu(tempTextView)
 
             if not content == '':                                       # if there is any content to display
                 tempTextView.appendPlainText(content)
@@ -1499,34 +1635,26 @@ class View(QObject):
             self.ui.ServicesTabWidget.removeTab(i)
 
     # this function restores the tool tabs based on the DB content (should be called when opening an existing project).
+    # only placeholders are kept here, the tabs of a host are created the first time it is selected (see loadToolTabsForHost)
     def restoreToolTabs(self):
         # false means we are fetching processes with display flag=False, which is the case for every process once a project is closed.
         tools = self.controller.getProcessesFromDB(self.filters, False)
-        # show a progress bar because this could take long
-        nbr = len(tools)
-        if nbr == 0:
-            nbr = 1
-        progress = 100.0 / nbr
-        totalprogress = 0
-        self.tick.emit(int(totalprogress))
+        self.tick.emit(0)
 
         for t in tools:
             if not t.tabtitle == '':
-                if 'screenshot' in str(t.tabtitle):
-                    imageviewer = self.createNewTabForHost(t.hostip, t.tabtitle, True, '', str(
-                        self.controller.getOutputFolder())+'/screenshots/'+str(t.outputfile))
-                    imageviewer.setObjectName(str(t.tabtitle))
-                    imageviewer.setProperty('dbId', QVariant(str(t.id)))
-                else:
-                    # True means we are restoring tabs. Set the widget's object name to the DB id of the process
-                    self.createNewTabForHost(t.hostip, t.tabtitle, True, t.output).setProperty(
-                        'dbId', QVariant(str(t.id)))
+                tabs = self.pendingToolTabs.setdefault(str(t.hostip), [])
+                tabs.append([str(t.id), str(t.tabtitle), str(t.outputfile)])
+
+        self.tick.emit(100)
 
-            # update the progress bar
-            totalprogress += progress
-            self.tick.emit(int(totalprogress))
+    # used when a process from a previous session runs again: it gets a new tab instead of the restored one
+    def removePendingToolTab(self, ip, dbId):
+        tabs = self.pendingToolTabs.get(str(ip), [])
+        self.pendingToolTabs[str(ip)] = [t for t in tabs if t[0] != str(dbId)]
 
     def restoreToolTabsForHost(self, ip):
+        self.loadToolTabsForHost(ip)
         if (self.hostTabs) and (ip in self.hostTabs):
             # use the ip as a key to retrieve its list of tooltabs
             tabs = self.hostTabs[ip]
@@ -1536,6 +1664,82 @@ class View(QObject):
                     # tabindex = self.ui.ServicesTabWidget.addTab(tab, tab.objectName())
                     self.ui.ServicesTabWidget.addTab(tab, tab.objectName())
 
+    # creates the widgets for the restored tabs of a host (if they don't exist yet) and marks the host as recently viewed
+    def loadToolTabsForHost(self, ip):
+        ip = str(ip)
+        if ip in self.restoredToolTabHosts:
+            self.restoredToolTabHosts.remove(ip)
+            self.restoredToolTabHosts.append(ip)
+            return
+
+        if not ip in self.pendingToolTabs:
+            return
+
+        # tabs created during this session (ie: tools we ran since opening the project) go after the restored ones
+        hosttabs = self.hostTabs.pop(ip, [])
+        for dbId, tabtitle, outputfile in self.pendingToolTabs.pop(ip):
+            self.createRestoredToolTab(ip, dbId, tabtitle, outputfile)
+        self.hostTabs[ip] = self.hostTabs.get(ip, []) + hosttabs
+
+        self.restoredToolTabHosts.append(ip)
+        self.evictToolTabs()
+
+    def createRestoredToolTab(self, ip, dbId, tabtitle, outputfile):
+        if 'screenshot' in tabtitle:
+            imageviewer = self.createNewTabForHost(ip, tabtitle, True, '', str(
+                self.controller.getOutputFolder())+'/screenshots/'+outputfile)
+            imageviewer.setObjectName(tabtitle)
+            imageviewer.setProperty('dbId', QVariant(dbId))
+            imageviewer.setProperty('outputfile', QVariant(outputfile))
+            return
+
+        # the output is read from the log file (only the end of it), older projects have it in the DB
+        content = ''
+        filename = ''
+        stored = self.controller.getProcessOutputFromDB(dbId)
+        if stored:
+            filename = self.controller.getProcessOutputLog(stored.filename)
+            if filename:
+                if not verifyOutputLog(filename, stored.size):
+                    print('[-] The output log of process ' + dbId + ' is missing or has changed: ' + filename)
+                content = readOutputTail(filename)
+            else:
+                content = str(stored.output or '')
+
+        # True means we are restoring tabs. Set the widget's object name to the DB id of the process
+        textview = self.createNewTabForHost(ip, tabtitle, True, content)
+        textview.setProperty('dbId', QVariant(dbId))
+        textview.setProperty('outputfile', QVariant(outputfile))
+        if filename:
+            textview.setProperty('outputLog', QVariant(filename))
+
+    # turns the restored tabs of the least recently viewed hosts back into placeholders
+    def evictToolTabs(self):
+        while len(self.restoredToolTabHosts) > self.maxRestoredToolTabHosts:
+            ip = self.restoredToolTabHosts.pop(0)
+            if ip == str(self.ip_clicked):
+                self.restoredToolTabHosts.append(ip)
+                continue
+
+            kept = []
+            evicted = []
+            for tab in self.hostTabs.get(ip, []):
+                if 'screenshot' in str(tab.objectName()):
+                    textview = tab
+                else:
+                    textview = tab.findChild(QPlainTextEdit)
+                # only restored tabs can be recreated (tools that ran in this session are still writing to theirs)
+                # and the textview could be showing in the tools display panel
+                if textview is None or textview.property('outputfile') is None:
+                    kept.append(tab)
+                    continue
+                evicted.append([str(textview.property('dbId')), str(tab.objectName()), str(textview.property('outputfile'))])
+                tab.deleteLater()
+
+            if evicted:
+                self.pendingToolTabs[ip] = evicted
+            self.hostTabs[ip] = kept
+
     # this function restores the textview widget (now in the tools display widget) to its original tool tab (under the correct host)
     def restoreToolTabWidget(self, clear=False):
         if self.ui.DisplayWidget.findChild(QPlainTextEdit) == self.ui.toolOutputTextView:
@@ -1555,6 +1759,28 @@ class View(QObject):
 
             self.ui.DisplayWidgetLayout.addWidget(self.ui.toolOutputTextView)
 
+    # the tool output widgets only keep the last lines of the output. this context menu allows the user to see all of it
+    def connectToolOutputContextMenu(self, textview):
+        textview.setContextMenuPolicy(Qt.CustomContextMenu)
+        textview.customContextMenuRequested.connect(
+            lambda pos: self.contextMenuToolOutput(textview, pos))
+
+    def contextMenuToolOutput(self, textview, pos):
+        menu = textview.createStandardContextMenu()
+        menu.addSeparator()
+        loadAction = menu.addAction("Load full output")
+        filename = textview.property('outputLog')
+        loadAction.setEnabled(bool(filename) and os.path.isfile(str(filename)))
+
+        menu.aboutToShow.connect(self.setVisible)
+        menu.aboutToHide.connect(self.setInvisible)
+        action = menu.exec_(textview.viewport().mapToGlobal(pos))
+
+        if action == loadAction:
+            dialog = ToolOutputDialog(
+                textview.objectName(), filename, self.ui.centralwidget)
+            dialog.show()
+
     #################### BRUTE TABS ####################
 
     def createNewBruteTab(self, ip, port, service):
@@ -1627,6 +1853,7 @@ class View(QObject):
             bWidget.validationLabel.hide()
             bWidget.toggleRunButton()
             bWidget.resetDisplay()                                      # fixes tab bug
+            self.connectToolOutputContextMenu(bWidget.display)
 
             hydraCommand = bWidget.buildHydraCommand(self.controller.getRunningFolder(
             ), self.controller.getUserlistPath(), self.controller.getPasslistPath())
@@ -1665,8 +1892,11 @@ class View(QObject):
         bWidget.pid = -1
 
         # disassociate textview from bWidget (create new textview for bWidget) and replace it with a new host tab
-        self.createNewTabForHost(str(bWidget.ip), str(bWidget.objectName()), restoring=True, content=str(
-            bWidget.display.toPlainText())).setProperty('dbId', QVariant(str(bWidget.display.property('dbId'))))
+        textview = self.createNewTabForHost(str(bWidget.ip), str(
+            bWidget.objectName()), restoring=True, content=str(bWidget.display.toPlainText()))
+        textview.setProperty('dbId', QVariant(
+            str(bWidget.display.property('dbId'))))
+        textview.setProperty('outputLog', bWidget.display.property('outputLog'))
 
         # go through host tabs and find the correct bWidget
         hosttabs = []